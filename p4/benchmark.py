@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Benchmark de vazão e latência do enlace
+####################################################
+""" Mede o que a pilha do p4 entrega de verdade
+
+Roda a Transferencia entre dois enlaces ligados por um
+par loopback com TransporteLimitado (taxa da UART) e
+varre baud rate, tamanho de payload, janela e modo
+(hex/raw). Para cada combinação reporta vazão de
+payload, eficiência contra a taxa teórica da UART
+(baud/10 bytes/s no 8N1) e p50/p99 da latência de cada
+chamada a getData no receptor.
+
+    python benchmark.py --baud 115200 --payload 50 114 --janela 1 8 \\
+        --saida resultados.json --compara antigo.json
+
+O JSON de saída permite comparar versões de RX, TX,
+fisica e Pacote (--compara mostra a variação de vazão).
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+
+import transporte
+from enlace import enlace
+from pacote import Pacote
+from transferencia import Transferencia
+
+
+def percentil(valores, p):
+    if not valores:
+        return(0.0)
+    valores = sorted(valores)
+    return(valores[min(len(valores) - 1, int(p / 100 * len(valores)))])
+
+
+def mede(baud, payload, janela, modo, tamanho, latencia=0.0):
+    """ Uma transferência completa; retorna o dicionário do resultado """
+    a, b = transporte.parLoopback()
+    a = transporte.TransporteLimitado(a, baud, latencia)
+    b = transporte.TransporteLimitado(b, baud, latencia)
+    cliente, server = enlace('A', modo, a), enlace('B', modo, b)
+    cliente.enable()
+    server.enable()
+
+    # latência de cada getData do lado que recebe
+    latencias = []
+    getData = server.getData
+    def getDataMedido(size, timeout=None):
+        inicio = time.perf_counter()
+        r = getData(size, timeout)
+        if r[1] > 0:
+            latencias.append(time.perf_counter() - inicio)
+        return(r)
+    server.getData = getDataMedido
+
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            origem  = os.path.join(pasta, 'origem')
+            destino = os.path.join(pasta, 'destino')
+            with open(origem, 'wb') as f:
+                f.write(os.urandom(tamanho))
+
+            # timeout com folga para o tempo de linha de uma janela cheia
+            tempoLinha = janela * (payload + 14) * 10 / baud * (2 if modo == 'hex' else 1)
+            timeout = max(0.2, 4 * tempoLinha + 2 * latencia)
+            tx = Transferencia(cliente, janela, timeout, pacote=Pacote(payload))
+            rx = Transferencia(server, janela, timeout, pacote=Pacote(payload))
+            erro = []
+            def recebe():
+                try:
+                    rx.recv_file(destino, timeout_hello=10)
+                except Exception as e:
+                    erro.append(repr(e))
+            thread = threading.Thread(target=recebe, daemon=True)
+            thread.start()
+            inicio = time.perf_counter()
+            tx.send_file(origem)
+            # o FIN confirmado já garante tudo gravado; o server ainda
+            # espera um pouco por FINs repetidos e isso não entra na conta
+            duracao = time.perf_counter() - inicio
+            thread.join()
+            with open(origem, 'rb') as f1, open(destino, 'rb') as f2:
+                integro = f1.read() == f2.read()
+    finally:
+        # sem isso as threads RX/TX (não daemon) seguram o processo se algo falhar
+        cliente.disable()
+        server.disable()
+    vazao = tamanho / duracao
+    return({
+        'baud':        baud,
+        'payload':     payload,
+        'janela':      janela,
+        'modo':        modo,
+        'bytes':       tamanho,
+        'segundos':    duracao,
+        'vazao':       vazao,
+        'eficiencia':  vazao / (baud / 10),
+        'getData_p50': percentil(latencias, 50),
+        'getData_p99': percentil(latencias, 99),
+        'getData_n':   len(latencias),
+        'reenvios':    tx.reenvios,
+        'integro':     integro and not erro,
+    })
+
+
+def chave(r):
+    return((r['baud'], r['payload'], r['janela'], r['modo']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark do enlace do p4')
+    parser.add_argument('--baud', type=int, nargs='+', default=[115200, 921600])
+    parser.add_argument('--payload', type=int, nargs='+', default=[50, 114])
+    parser.add_argument('--janela', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--modo', nargs='+', default=['hex', 'raw'], choices=['hex', 'raw'])
+    parser.add_argument('--tamanho', type=int, default=20000, help='bytes por transferência')
+    parser.add_argument('--latencia', type=float, default=0.0, help='latência da linha (s)')
+    parser.add_argument('--saida', default='benchmark.json')
+    parser.add_argument('--rotulo', default='', help='identifica a versão medida')
+    parser.add_argument('--compara', help='JSON de uma execução anterior')
+    args = parser.parse_args()
+
+    resultados = []
+    print('{:>7} {:>7} {:>6} {:>4} {:>10} {:>6} {:>9} {:>9}'.format(
+        'baud', 'payload', 'janela', 'modo', 'B/s', 'efic', 'p50 ms', 'p99 ms'))
+    for baud in args.baud:
+        for payload in args.payload:
+            for janela in args.janela:
+                for modo in args.modo:
+                    r = mede(baud, payload, janela, modo, args.tamanho, args.latencia)
+                    resultados.append(r)
+                    print('{baud:>7} {payload:>7} {janela:>6} {modo:>4} {vazao:>10.0f} '
+                          '{eficiencia:>6.1%} {:>9.2f} {:>9.2f}{}'.format(
+                              r['getData_p50'] * 1000, r['getData_p99'] * 1000,
+                              '' if r['integro'] else '  [CORROMPIDO]', **r))
+
+    with open(args.saida, 'w') as f:
+        json.dump({
+            'rotulo':     args.rotulo,
+            'instante':   time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python':     platform.python_version(),
+            'latencia':   args.latencia,
+            'resultados': resultados,
+        }, f, indent=2)
+    print('resultados em {}'.format(args.saida))
+
+    if args.compara:
+        with open(args.compara) as f:
+            antigos = {chave(r): r for r in json.load(f)['resultados']}
+        print('\nvazão contra {}:'.format(args.compara))
+        for r in resultados:
+            antigo = antigos.get(chave(r))
+            if antigo:
+                print('  {} {:+.1%}'.format(chave(r), r['vazao'] / antigo['vazao'] - 1))
+    if not all(r['integro'] for r in resultados):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,54 @@
+import sys
+import time as t
+from enlace import enlace
+from transferencia import Transferencia, TransferenciaAbortada
+
 
 class Client(object):
-    def __init__(self):
+    def __init__(self, serialName, janela=8, log='log_client.txt', compressao=None, retomadas=3):
         self.sac = b'\xAF\xAF' # byte de sacrificio
-        
+        self.com = enlace(serialName)
+        self.janela = janela
+        self.log = log
+        self.compressao = compressao
+        # tentativas ao todo; cada nova tentativa continua do último bloco bom
+        self.retomadas = retomadas
+
+    def envia(self, caminho):
+        self.com.enable()
+        try:
+            # o server descarta o byte de sacrificio antes do protocolo
+            self.com.sendData(self.sac).result()
+            t.sleep(0.1)
+            for tentativa in range(1, self.retomadas + 1):
+                # Transferencia nova a cada tentativa: nada da janela ou
+                # do buffer de recepção da anterior sobra
+                transf = Transferencia(self.com, janela=self.janela, log=self.log,
+                                       compressao=self.compressao)
+                try:
+                    return(transf.send_file(caminho))
+                except TransferenciaAbortada as e:
+                    if tentativa == self.retomadas:
+                        raise
+                    print('Transferência interrompida ({}), retomando...'.format(e))
+                    t.sleep(1)
+                    self.com.rx.clearBuffer()
+                finally:
+                    transf.fecha()
+        finally:
+            self.com.disable()
+
+def main():
+    if len(sys.argv) < 3:
+        print('uso: python client.py PORTA ARQUIVO [zlib|lzma]')
+        return
+    c = Client(sys.argv[1], compressao=sys.argv[3] if len(sys.argv) > 3 else None)
+
+    print('#################################################')
+    print('#####         Cliente inicializando         #####')
+    print('#################################################')
+    total = c.envia(sys.argv[2])
+    print('Arquivo enviado em {} pacotes.'.format(total))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Compressão do arquivo durante a transferência
+####################################################
+""" Compressão negociada no HELLO
+
+O cliente oferece um codec no HELLO e o server diz no
+ACK 0 se aceita. Aceito, o arquivo é lido em blocos
+(32 KiB por padrão) e cada bloco é comprimido sozinho,
+numa thread à parte, enquanto os pacotes anteriores
+ainda estão na linha. A saída de cada bloco é cortada
+em payloads; o último pedaço do bloco leva FLAG_FIM_BLOCO.
+
+Blocos que não comprimem (já compactados, imagens,
+dados aleatórios) vão crus, sem FLAG_COMPRIMIDO: uma
+amostra do começo do bloco passa antes pelo zlib no
+nível 1 e, se não encolher, o bloco nem é comprimido.
+
+Como cada pacote carrega um número variável de bytes do
+arquivo, o total de pacotes só é conhecido no fim; até
+lá os pacotes de dados levam total 0 e o FIN traz o
+total verdadeiro.
+"""
+
+import lzma
+import zlib
+import threading
+
+# códigos no HELLO/ACK 0
+SEM_COMPRESSAO = 0
+ZLIB           = 1
+LZMA           = 2
+CODECS = {'zlib': ZLIB, 'lzma': LZMA}
+
+# flags do header dos pacotes de dados
+FLAG_COMPRIMIDO = 0x01
+FLAG_FIM_BLOCO  = 0x02
+
+# lzma cru, sem o cabeçalho do .xz (que custa ~60 bytes por bloco)
+FILTROS_LZMA = [{'id': lzma.FILTER_LZMA2, 'preset': 6}]
+
+
+def comprime(codec, bloco):
+    if codec == ZLIB:
+        return(zlib.compress(bloco, 6))
+    return(lzma.compress(bloco, format=lzma.FORMAT_RAW, filters=FILTROS_LZMA))
+
+
+def descomprime(codec, data):
+    if codec == ZLIB:
+        return(zlib.decompress(data))
+    return(lzma.decompress(data, format=lzma.FORMAT_RAW, filters=FILTROS_LZMA))
+
+
+def compressivel(bloco, amostra=4096, limiar=0.9):
+    """ Estimativa barata: a amostra encolhe pelo menos 10% no zlib -1? """
+    amostra = bloco[:amostra]
+    return(len(zlib.compress(amostra, 1)) < limiar * len(amostra))
+
+
+class Compressor(object):
+    """ Gera os payloads dos pacotes de dados numa thread
+
+    Os payloads ficam em prontos[id] = (payload, flags)
+    até o pacote ser confirmado (libera). A thread para
+    quando tem maxProntos pacotes esperando, então a
+    memória usada não depende do tamanho do arquivo.
+    """
+
+    def __init__(self, view, codec, tamanho_payload, bloco=32768, maxProntos=1024):
+        self.view       = view
+        self.codec      = codec
+        self.P          = tamanho_payload
+        self.bloco      = bloco
+        self.maxProntos = maxProntos
+        self.prontos    = {}
+        self.gerados    = 0     # pacotes já gerados (ids 1..gerados)
+        self.total      = None  # conhecido quando a thread termina
+        self.erro       = None
+        self.threadStop = False
+        self.cond       = threading.Condition()
+        # estatísticas
+        self.bytesEntrada = 0
+        self.bytesSaida   = 0
+        self.blocosCrus   = 0
+        self.thread = threading.Thread(target=self.gera, daemon=True)
+
+    def threadStart(self):
+        self.thread.start()
+
+    def threadKill(self):
+        with self.cond:
+            self.threadStop = True
+            self.cond.notify_all()
+        self.thread.join()
+        self.prontos.clear()
+
+    def gera(self):
+        try:
+            for inicio in range(0, len(self.view), self.bloco):
+                with self.view[inicio:inicio + self.bloco] as bloco:
+                    pedacos = self.pedacos(bloco)
+                for pedaco in pedacos:
+                    with self.cond:
+                        self.cond.wait_for(lambda: self.threadStop or
+                                           len(self.prontos) < self.maxProntos)
+                        if self.threadStop:
+                            return
+                        self.gerados += 1
+                        self.prontos[self.gerados] = pedaco
+                        self.cond.notify_all()
+            with self.cond:
+                if self.gerados == 0:
+                    # arquivo vazio: um pacote sem payload, como no Pacote.empacotar
+                    self.gerados = 1
+                    self.prontos[1] = (b"", 0)
+                self.total = self.gerados
+                self.cond.notify_all()
+        except Exception as e:
+            with self.cond:
+                self.erro = e
+                self.cond.notify_all()
+
+    def pedacos(self, bloco):
+        """ Lista de (payload, flags) de um bloco do arquivo """
+        self.bytesEntrada += len(bloco)
+        flags = 0
+        data  = bloco
+        if compressivel(bloco):
+            comprimido = comprime(self.codec, bloco)
+            if len(comprimido) < len(bloco):
+                data, flags = comprimido, FLAG_COMPRIMIDO
+        if not flags:
+            self.blocosCrus += 1
+        self.bytesSaida += len(data)
+        pedacos = [(bytes(data[i:i + self.P]), flags) for i in range(0, len(data), self.P)]
+        if flags:
+            payload, _ = pedacos[-1]
+            pedacos[-1] = (payload, flags | FLAG_FIM_BLOCO)
+        return(pedacos)
+
+    def disponiveis(self, timeout=0):
+        """ Quantos pacotes já podem ser enviados; espera até
+        timeout segundos se a thread ainda não gerou o próximo.
+        """
+        with self.cond:
+            if timeout:
+                n = self.gerados
+                self.cond.wait_for(lambda: self.gerados > n or self.total is not None
+                                   or self.erro is not None, timeout)
+            if self.erro is not None:
+                raise self.erro
+            return(self.gerados)
+
+    def payload(self, id):
+        return(self.prontos[id])
+
+    def libera(self, base):
+        """ Descarta os pacotes já confirmados (ids < base) """
+        with self.cond:
+            for id in [id for id in self.prontos if id < base]:
+                del self.prontos[id]
+            self.cond.notify_all()
+
+    def razao(self):
+        return(self.bytesSaida / self.bytesEntrada if self.bytesEntrada else 1.0)
+
+
+class Descompressor(object):
+    """ Lado do server: recebe os payloads em ordem e devolve
+    os bytes do arquivo.
+    """
+
+    def __init__(self, codec):
+        self.codec  = codec
+        self.partes = []
+
+    def alimenta(self, payload, flags):
+        if not flags & FLAG_COMPRIMIDO:
+            return(payload)
+        self.partes.append(payload)
+        if not flags & FLAG_FIM_BLOCO:
+            return(b"")
+        data, self.partes = b"".join(self.partes), []
+        return(descomprime(self.codec, data))
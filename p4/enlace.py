@@ -17,16 +17,25 @@ from interfaceFisica import fisica
 from enlaceRx import RX
 from enlaceTx import TX
 
+# Estatísticas
+from metricas import Metricas
+
 class enlace(object):
     
-    def __init__(self, name):
-        self.fisica      = fisica(name)
-        self.rx          = RX(self.fisica)
-        self.tx          = TX(self.fisica)
+    def __init__(self, name, modo='hex', transporte=None, fec=None):
+        self.metricas    = Metricas()
+        self.fisica      = fisica(name, modo, transporte, self.metricas, fec)
+        self.rx          = RX(self.fisica, metricas=self.metricas)
+        self.tx          = TX(self.fisica, metricas=self.metricas)
         self.connected   = False
 
-    def enable(self):
+    def enable(self, negociar=False):
+        """ Com negociar=True tenta o modo raw com o outro
+        lado antes de iniciar as threads (ver fisica.negocia).
+        """
         self.fisica.open()
+        if negociar:
+            self.fisica.negocia()
         self.rx.threadStart()
         self.tx.threadStart()
 
@@ -37,8 +46,12 @@ class enlace(object):
         self.fisica.close()
 
     def sendData(self, data):
-        self.tx.sendBuffer(data)
+        """ Retorna um Future: sendData(data).result()
+        espera até esses bytes serem escritos.
+        """
+        return(self.tx.sendBuffer(data))
         
-    def getData(self, size):
-        data = self.rx.getNData(size)
+    def getData(self, size, timeout=None):
+        """ Com timeout pode retornar menos que size bytes """
+        data = self.rx.getNData(size, timeout)
         return(data, len(data))
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Camada de Enlace com asyncio
+####################################################
+""" Enlace sem threads, dirigido pelo event loop
+
+O enlace clássico usa uma thread RX e uma TX por porta.
+Aqui a porta é registrada no loop (add_reader/add_writer
+sobre o descritor da serial, pty, pipe ou socket), então
+um único loop atende quantas portas forem necessárias:
+
+    async def main():
+        a, b = AsyncEnlace('A', transporte=ta), AsyncEnlace('B', transporte=tb)
+        await a.enable(); await b.enable()
+        await asyncio.gather(a.send(dados), b.recv(len(dados)))
+
+A codificação (hex/raw) é a mesma da fisica.
+Só funciona em POSIX (a serial precisa expor fileno());
+o TransporteLimitado é recusado no enable (ValueError).
+"""
+
+import os
+import asyncio
+import collections
+
+# Interface Física
+from interfaceFisica import fisica
+
+from pacote import Pacote
+from quadro import ExtratorQuadros
+from metricas import Metricas
+from transporte import descritores
+
+
+class AsyncEnlace(object):
+
+    def __init__(self, name, modo='hex', transporte=None, pacote=None):
+        self.metricas   = Metricas()
+        self.fisica     = fisica(name, modo, transporte, self.metricas)
+        self.p          = pacote if pacote is not None else Pacote()
+        self.rxBuffer   = bytearray()
+        self.pacotes    = collections.deque()
+        self.extrator   = ExtratorQuadros(self.p.EOP)
+        self.esperando  = []
+        self.txPendente = bytearray()
+        self.txTotal    = 0
+        self.txEscritos = 0
+        self.txEsperas  = collections.deque()
+        self.escrevendo = False
+        self.fechado    = False
+        self.loop       = None
+
+    async def enable(self, negociar=False):
+        self.loop = asyncio.get_running_loop()
+        self.fisica.open()
+        if negociar:
+            # negociação é curta e bloqueante, roda fora do loop
+            await self.loop.run_in_executor(None, self.fisica.negocia)
+        try:
+            self.fdLeitura, self.fdEscrita = descritores(self.fisica.port)
+        except ValueError:
+            self.fisica.close()
+            raise
+        os.set_blocking(self.fdLeitura, False)
+        os.set_blocking(self.fdEscrita, False)
+        self.loop.add_reader(self.fdLeitura, self.leitura)
+
+    def disable(self):
+        self.loop.remove_reader(self.fdLeitura)
+        if self.escrevendo:
+            self.loop.remove_writer(self.fdEscrita)
+        self.fechado = True
+        self.acorda()
+        self.fisica.close()
+
+    ############
+    # recepção #
+    ############
+
+    def leitura(self):
+        try:
+            rxBuffer = os.read(self.fdLeitura, 4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            rxBuffer = b""
+        if not rxBuffer:
+            # fim de arquivo: o outro lado fechou
+            self.loop.remove_reader(self.fdLeitura)
+            self.fechado = True
+            self.acorda()
+            return
+        data, nRx = self.fisica.decodifica(rxBuffer)
+        while self.fisica.txControle:
+            self.escreve(self.fisica.txControle.pop(0))
+        if data:
+            self.metricas.soma(bytesRx=len(data))
+            self.rxBuffer += data
+            self.metricas.ocupacaoRx(len(self.rxBuffer))
+            self.acorda()
+
+    def acorda(self):
+        esperando, self.esperando = self.esperando, []
+        for futuro in esperando:
+            if not futuro.done():
+                futuro.set_result(None)
+
+    async def espera(self):
+        if self.fechado:
+            raise ConnectionError('enlace fechado')
+        futuro = self.loop.create_future()
+        self.esperando.append(futuro)
+        await futuro
+
+    async def recv(self, n):
+        """ Retorna exatamente n bytes """
+        while len(self.rxBuffer) < n:
+            await self.espera()
+        data = bytes(self.rxBuffer[:n])
+        del self.rxBuffer[:n]
+        return(data)
+
+    async def recv_packet(self):
+        """ Próximo pacote completo (PacoteRecebido, payload em bytes)
+
+        Pacotes com CRC errado também são retornados,
+        com ok=False, para quem quiser pedir reenvio.
+        """
+        while not self.pacotes:
+            if self.p.stuffing:
+                pacotes = [self.p.le_quadro(q) for q in self.extrator.alimenta(self.rxBuffer)]
+                self.rxBuffer.clear()
+                pacotes = [pk for pk in pacotes if pk is not None]
+                consumido = 0
+            else:
+                pacotes, consumido, erros = self.p.desempacotar(self.rxBuffer)
+            # copia os payloads antes de liberar o buffer
+            self.pacotes.extend([pk._replace(payload=bytes(pk.payload)) for pk in pacotes])
+            del pacotes
+            del self.rxBuffer[:consumido]
+            if not self.pacotes:
+                await self.espera()
+        return(self.pacotes.popleft())
+
+    #########
+    # envio #
+    #########
+
+    def escreve(self, data):
+        self.txPendente += data
+        self.txTotal    += len(data)
+        futuro = self.loop.create_future()
+        self.txEsperas.append((self.txTotal, futuro))
+        self.escrita()
+        return(futuro)
+
+    def escrita(self):
+        try:
+            n = os.write(self.fdEscrita, self.txPendente)
+        except BlockingIOError:
+            n = 0
+        except OSError as erro:
+            # chamada pelo loop (add_writer): o erro vai para quem espera o envio
+            self.falhaEscrita(erro)
+            return
+        del self.txPendente[:n]
+        self.txEscritos += n
+        while self.txEsperas and self.txEsperas[0][0] <= self.txEscritos:
+            futuro = self.txEsperas.popleft()[1]
+            # send cancelado (wait_for, por exemplo): os bytes vão mesmo assim
+            if not futuro.done():
+                futuro.set_result(None)
+        if self.txPendente and not self.escrevendo:
+            self.loop.add_writer(self.fdEscrita, self.escrita)
+            self.escrevendo = True
+        elif not self.txPendente and self.escrevendo:
+            self.loop.remove_writer(self.fdEscrita)
+            self.escrevendo = False
+
+    def falhaEscrita(self, erro):
+        """ Descarta o que falta escrever e falha os envios pendentes """
+        self.txPendente.clear()
+        self.txEscritos = self.txTotal
+        while self.txEsperas:
+            futuro = self.txEsperas.popleft()[1]
+            if not futuro.done():
+                futuro.set_exception(ConnectionError('erro de escrita na porta: {}'.format(erro)))
+        if self.escrevendo:
+            self.loop.remove_writer(self.fdEscrita)
+            self.escrevendo = False
+
+    async def send(self, data):
+        """ Retorna quando data foi todo escrito na porta """
+        inicio = self.loop.time()
+        await self.escreve(self.fisica.codifica(data))
+        self.metricas.envioTx(len(data), self.loop.time() - inicio)
+        return(len(data))
@@ -13,36 +13,118 @@ import time
 # Threads
 import threading
 
+# Estatísticas
+from metricas import Metricas
+
+
+class RingBuffer(object):
+    """ Buffer circular de bytes com capacidade fixa
+
+    A memória é alocada uma única vez (bytearray) e
+    acessada por memoryview, assim escrever ou ler
+    não copia o restante do buffer como fazia o
+    antigo `self.buffer += rxTemp`.
+    Não é thread safe: o RX protege com seu lock.
+    """
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.dados      = bytearray(capacidade)
+        self.view       = memoryview(self.dados)
+        self.inicio     = 0
+        self.tamanho    = 0
+
+    def __len__(self):
+        return(self.tamanho)
+
+    def livre(self):
+        return(self.capacidade - self.tamanho)
+
+    def escreve(self, data):
+        """ Copia o máximo possível de data e retorna
+        quantos bytes foram escritos.
+        """
+        data = memoryview(data)
+        n    = min(len(data), self.livre())
+        fim  = (self.inicio + self.tamanho) % self.capacidade
+        n1   = min(n, self.capacidade - fim)
+        self.view[fim:fim + n1] = data[:n1]
+        self.view[0:n - n1]     = data[n1:n]
+        self.tamanho += n
+        return(n)
+
+    def le(self, nData):
+        """ Remove e retorna até nData bytes do início """
+        n  = min(nData, self.tamanho)
+        n1 = min(n, self.capacidade - self.inicio)
+        b  = self.view[self.inicio:self.inicio + n1].tobytes()
+        if n1 < n:
+            b += self.view[0:n - n1].tobytes()
+        self.inicio   = (self.inicio + n) % self.capacidade
+        self.tamanho -= n
+        return(b)
+
+    def limpa(self):
+        self.inicio  = 0
+        self.tamanho = 0
+
+
 # Class
 class RX(object):
-  
-    def __init__(self, fisica):
+
+    def __init__(self, fisica, capacidade=65536, metricas=None):
         self.fisica      = fisica
-        self.buffer      = bytes(bytearray())
+        self.metricas    = metricas if metricas is not None else Metricas()
+        self.buffer      = RingBuffer(capacidade)
+        self.lock        = threading.Lock()
+        self.cond        = threading.Condition(self.lock)
+        self.ativo       = threading.Event()
+        self.ativo.set()
         self.threadStop  = False
-        self.threadMutex = True
         self.READLEN     = 1024
 
-    def thread(self): 
+    def thread(self):
+        # fisica.read bloqueia até chegar algo (ou timeout da porta),
+        # então não há sleep fixo entre leituras
         while not self.threadStop:
-            if(self.threadMutex == True):
-                rxTemp, nRx = self.fisica.read(self.READLEN)
-                if (nRx > 0):
-                    self.buffer += rxTemp  
-                time.sleep(0.01)
-
-    def threadStart(self):       
+            self.ativo.wait()
+            if self.threadStop:
+                break
+            rxTemp, nRx = self.fisica.read(self.READLEN)
+            if (len(rxTemp) > 0):
+                self.metricas.soma(bytesRx=len(rxTemp))
+                self.armazena(rxTemp)
+
+    def armazena(self, data):
+        """ Guarda data no buffer circular, esperando
+        espaço livre se o leitor estiver atrasado.
+        """
+        data = memoryview(data)
+        with self.cond:
+            while len(data) > 0 and not self.threadStop:
+                n = self.buffer.escreve(data)
+                data = data[n:]
+                if n > 0:
+                    self.metricas.ocupacaoRx(len(self.buffer))
+                    self.cond.notify_all()
+                if len(data) > 0:
+                    self.cond.wait()
+
+    def threadStart(self):
         self.thread = threading.Thread(target=self.thread, args=())
         self.thread.start()
 
     def threadKill(self):
         self.threadStop = True
+        self.ativo.set()
+        with self.cond:
+            self.cond.notify_all()
 
     def threadPause(self):
-        self.threadMutex = False
+        self.ativo.clear()
 
     def threadResume(self):
-        self.threadMutex = True
+        self.ativo.set()
 
     def getIsEmpty(self):
         if(self.getBufferLen() == 0):
@@ -51,29 +133,50 @@ class RX(object):
             return(False)
 
     def getBufferLen(self):
-        return(len(self.buffer))
+        with self.lock:
+            return(len(self.buffer))
 
     def getAllBuffer(self, len):
-        self.threadPause()
-        b = self.buffer[:]
-        self.clearBuffer()
-        self.threadResume()
+        with self.cond:
+            b = self.buffer.le(self.buffer.tamanho)
+            self.cond.notify_all()
         return(b)
 
     def getBuffer(self, nData):
-        self.threadPause()
-        b           = self.buffer[0:nData]
-        self.buffer = self.buffer[nData:]
-        self.threadResume()
+        with self.cond:
+            b = self.buffer.le(nData)
+            self.cond.notify_all()
         return(b)
 
-    def getNData(self, size):
-        while(self.getBufferLen() < size):
-            time.sleep(0.05)                 
-        return(self.getBuffer(size))
-
+    def getNData(self, size, timeout=None):
+        """ Bloqueia até existirem size bytes no buffer
+
+        A thread de leitura acorda quem espera assim que
+        os dados chegam. Pedidos maiores que a capacidade
+        do buffer são montados em partes. Com timeout, ao
+        estourar o prazo retorna o que já foi lido.
+        """
+        inicio = time.monotonic()
+        limite = None if timeout is None else inicio + timeout
+        partes = []
+        faltam = size
+        with self.cond:
+            while faltam > 0:
+                alvo     = min(faltam, self.buffer.capacidade)
+                restante = None if limite is None else max(0, limite - time.monotonic())
+                pronto   = self.cond.wait_for(
+                    lambda: len(self.buffer) >= alvo or self.threadStop, restante)
+                b = self.buffer.le(faltam)
+                faltam -= len(b)
+                partes.append(b)
+                self.cond.notify_all()
+                if not pronto or self.threadStop:
+                    break
+        duracao = time.monotonic() - inicio
+        self.metricas.esperaRx(duracao)
+        return(b"".join(partes))
 
     def clearBuffer(self):
-        self.buffer = b""
-
-
+        with self.cond:
+            self.buffer.limpa()
+            self.cond.notify_all()
@@ -7,29 +7,92 @@
 #  Camada de Enlace
 ####################################################
 
+# Fila de envio
+import queue
+
 # Importa pacote de tempo
 import time
 
 # Threads
 import threading
 
+# Aviso de conclusão de cada envio
+from concurrent.futures import Future
+
+# Estatísticas
+from metricas import Metricas
+
 # Class
 class TX(object):
- 
-    def __init__(self, fisica):
+
+    def __init__(self, fisica, maxFila=64, maxAgrupa=4096, metricas=None):
         self.fisica      = fisica
-        self.buffer      = bytes(bytearray())
+        self.metricas    = metricas if metricas is not None else Metricas()
+        self.fila        = queue.Queue(maxFila)
+        self.maxAgrupa   = maxAgrupa
         self.transLen    = 0
-        self.empty       = True
-        self.threadMutex = False
+        self.pendentes   = 0
+        self.lock        = threading.Lock()
+        self.ativo       = threading.Event()
+        self.ativo.set()
         self.threadStop  = False
 
-
     def thread(self):
+        # fila.get bloqueia enquanto não há nada para enviar
         while not self.threadStop:
-            if(self.threadMutex):
-                self.transLen    = self.fisica.write(self.buffer)
-                self.threadMutex = False
+            item = self.fila.get()
+            if item is None:
+                break
+            self.ativo.wait()
+            lote = [item]
+            total = len(item[0])
+            # agrupa quadros pequenos já enfileirados em um único write
+            while total < self.maxAgrupa:
+                try:
+                    item = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.threadStop = True
+                    break
+                lote.append(item)
+                total += len(item[0])
+            self.envia(lote)
+        self.cancelaPendentes()
+
+    def cancelaPendentes(self):
+        # quem ainda espera um envio não fica bloqueado para sempre
+        while True:
+            try:
+                item = self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].cancel()
+                with self.lock:
+                    self.pendentes -= 1
+
+    def envia(self, lote):
+        # envios cancelados por quem esperava são descartados; depois
+        # de set_running_or_notify_cancel o futuro não pode mais ser cancelado
+        vivos = [item for item in lote if item[1].set_running_or_notify_cancel()]
+        try:
+            if len(vivos) == 1:
+                nTx = self.fisica.write(vivos[0][0])
+            elif vivos:
+                nTx = self.fisica.writeLote([data for data, futuro, instante in vivos])
+        except Exception as e:
+            for data, futuro, instante in vivos:
+                futuro.set_exception(e)
+        else:
+            if vivos:
+                self.transLen = nTx
+            agora = time.monotonic()
+            for data, futuro, instante in vivos:
+                self.metricas.envioTx(len(data), agora - instante)
+                futuro.set_result(len(data))
+        with self.lock:
+            self.pendentes -= len(lote)
 
     def threadStart(self):
         self.thread = threading.Thread(target=self.thread, args=())
@@ -37,25 +100,37 @@ class TX(object):
 
     def threadKill(self):
         self.threadStop = True
+        self.ativo.set()
+        try:
+            self.fila.put_nowait(None)
+        except queue.Full:
+            pass
 
     def threadPause(self):
-        self.threadMutex = False
+        self.ativo.clear()
 
     def threadResume(self):
-        self.threadMutex = True
+        self.ativo.set()
 
     def sendBuffer(self, data):
-        self.transLen   = 0
-        self.buffer = data
-        self.threadMutex  = True
+        """ Enfileira data para envio
+
+        Bloqueia se a fila estiver cheia. Retorna um
+        Future que é concluído com o número de bytes
+        quando data for escrito pela fisica.
+        """
+        futuro = Future()
+        with self.lock:
+            self.pendentes += 1
+        self.transLen = 0
+        self.fila.put((bytes(data), futuro, time.monotonic()))
+        return(futuro)
 
     def getBufferLen(self):
-        return(len(self.buffer))
+        return(self.fila.qsize())
 
     def getStatus(self):
         return(self.transLen)
-        
 
     def getIsBussy(self):
-        return(self.threadMutex)
-
+        return(self.pendentes > 0)
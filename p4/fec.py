@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Correção de erros (FEC) dos quadros do enlace
+####################################################
+""" Códigos corretores para linhas ruidosas
+
+Com fisica(..., fec=...) cada quadro do modo raw é
+codificado antes do SLIP e corrigido na recepção, então
+um bit trocado no cabo não custa mais um reenvio do
+pacote inteiro. Os dois lados precisam usar o mesmo
+código. No modo hex o fec é ignorado.
+
+O FEC corrige bits trocados que mantêm o tamanho do
+quadro. Um erro que cria ou apaga um escape SLIP (ou
+um END) muda o tamanho do quadro depois do slipDecode;
+esse quadro não é decodificado e conta como
+incorrigível.
+
+    Hamming74()        4 bits -> 7, corrige 1 bit por palavra
+    Secded()           4 bits -> 8, corrige 1 e detecta 2
+    ReedSolomon(16)    16 bytes de paridade por palavra de
+                       até 255 bytes, corrige 8 bytes errados
+
+Rajadas (vários bits seguidos) são espalhadas por
+intercala=True (Hamming/SECDED: bit i de todas as
+palavras, depois bit i+1...) ou profundidade=d no
+Reed-Solomon (byte i do quadro vai para a palavra i % d).
+
+Codificação e decodificação são tabelas de consulta
+aplicadas com numpy ao quadro inteiro; só as palavras
+Reed-Solomon com síndrome diferente de zero passam pelo
+Berlekamp-Massey, em Python.
+
+decodifica retorna os dados corrigidos, ou None se o
+quadro não tem conserto. Os contadores corrigidos e
+incorrigiveis acumulam o que aconteceu.
+"""
+
+import numpy as np
+
+
+#######################
+# Hamming(7,4)/SECDED #
+#######################
+
+def _hamming74(d):
+    """ Palavra de 7 bits (p1 p2 d1 p3 d2 d3 d4) do nibble d """
+    d1, d2, d3, d4 = (d >> 3) & 1, (d >> 2) & 1, (d >> 1) & 1, d & 1
+    p1 = d1 ^ d2 ^ d4
+    p2 = d1 ^ d3 ^ d4
+    p3 = d2 ^ d3 ^ d4
+    return(p1 << 6 | p2 << 5 | d1 << 4 | p3 << 3 | d2 << 2 | d3 << 1 | d4)
+
+
+def _sindrome74(c):
+    """ Posição (1..7, 0 = nenhuma) do bit errado """
+    bits = [(c >> (7 - i)) & 1 for i in range(1, 8)]
+    s = 0
+    for pos, b in enumerate(bits, 1):
+        if b:
+            s ^= pos
+    return(s)
+
+
+def _dados74(c):
+    return(((c >> 4) & 1) << 3 | ((c >> 2) & 1) << 2 | ((c >> 1) & 1) << 1 | (c & 1))
+
+
+def _tabelas():
+    cod74 = np.array([_hamming74(d) for d in range(16)], np.uint8)
+    dec74 = np.zeros(128, np.uint8)
+    cor74 = np.zeros(128, bool)
+    for c in range(128):
+        s = _sindrome74(c)
+        dec74[c] = _dados74(c ^ (1 << (7 - s)) if s else c)
+        cor74[c] = s != 0
+
+    # SECDED: palavra de Hamming << 1 | paridade geral
+    cod84 = np.array([c << 1 | bin(c).count('1') & 1 for c in cod74.tolist()], np.uint8)
+    dec84 = np.zeros(256, np.uint8)
+    est84 = np.zeros(256, np.uint8)   # 0 ok, 1 corrigido, 2 sem conserto
+    for c in range(256):
+        s = _sindrome74(c >> 1)
+        impar = bin(c).count('1') & 1
+        if s == 0:
+            est84[c] = 1 if impar else 0  # erro só no bit de paridade
+        elif impar:
+            est84[c] = 1
+        else:
+            est84[c] = 2                  # dois bits errados
+        dec84[c] = dec74[c >> 1]
+    return(cod74, dec74, cor74, cod84, dec84, est84)
+
+
+COD74, DEC74, COR74, COD84, DEC84, EST84 = _tabelas()
+PESOS7 = np.array([64, 32, 16, 8, 4, 2, 1], np.uint8)
+
+
+def _nibbles(data):
+    a = np.frombuffer(data, np.uint8)
+    nib = np.empty(2 * len(a), np.uint8)
+    nib[0::2] = a >> 4
+    nib[1::2] = a & 0x0F
+    return(nib)
+
+
+def _bytes(nib):
+    return(((nib[0::2] << 4) | nib[1::2]).astype(np.uint8).tobytes())
+
+
+class Hamming74(object):
+    """ Hamming(7,4): 14 bits por byte, os bits são empacotados """
+
+    def __init__(self, intercala=False):
+        self.intercala     = intercala
+        self.corrigidos    = 0
+        self.incorrigiveis = 0
+
+    def codifica(self, data):
+        palavras = COD74[_nibbles(data)]
+        bits = np.unpackbits(palavras[:, None], axis=1)[:, 1:]
+        if self.intercala:
+            bits = bits.T
+        return(np.packbits(bits.ravel()).tobytes())
+
+    def decodifica(self, data):
+        bits = np.unpackbits(np.frombuffer(data, np.uint8))
+        n = 2 * (len(bits) // 14)  # palavras; o resto é enchimento do packbits
+        bits = bits[:7 * n]
+        bits = bits.reshape(7, n).T if self.intercala else bits.reshape(n, 7)
+        palavras = bits @ PESOS7
+        self.corrigidos += int(np.count_nonzero(COR74[palavras]))
+        return(_bytes(DEC74[palavras]))
+
+
+class Secded(object):
+    """ Hamming(7,4) mais um bit de paridade geral: 1 byte por nibble """
+
+    def __init__(self, intercala=False):
+        self.intercala     = intercala
+        self.corrigidos    = 0
+        self.incorrigiveis = 0
+
+    def codifica(self, data):
+        palavras = COD84[_nibbles(data)]
+        if not self.intercala:
+            return(palavras.tobytes())
+        return(np.packbits(np.unpackbits(palavras[:, None], axis=1).T.ravel()).tobytes())
+
+    def decodifica(self, data):
+        palavras = np.frombuffer(data, np.uint8)
+        if len(palavras) % 2:
+            self.incorrigiveis += 1
+            return(None)
+        if self.intercala:
+            bits = np.unpackbits(palavras).reshape(8, len(palavras)).T
+            palavras = np.packbits(bits, axis=1)[:, 0]
+        estado = EST84[palavras]
+        if (estado == 2).any():
+            self.incorrigiveis += 1
+            return(None)
+        self.corrigidos += int(np.count_nonzero(estado))
+        return(_bytes(DEC84[palavras]))
+
+
+################
+# GF(256) e RS #
+################
+
+# polinômio primitivo x^8 + x^4 + x^3 + x^2 + 1, alfa = 2.
+# LOG[0] aponta para a faixa de zeros de EXP, então
+# EXP[LOG[a] + LOG[b]] = a*b vale também com zeros e as
+# multiplicações com numpy dispensam máscara.
+EXP = np.zeros(1024, np.uint8)
+LOG = np.zeros(256, np.int64)
+_x = 1
+for _i in range(255):
+    EXP[_i] = _x
+    LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11D
+EXP[255:510] = EXP[:255]
+LOG[0] = 510
+_EXP = EXP.tolist()
+_LOG = LOG.tolist()
+# POT[g, j] = log de alfa^(g*j): peso do coeficiente de grau g na síndrome j
+POT = np.outer(np.arange(255), np.arange(255)) % 255
+
+
+def gf_mul(a, b):
+    if a == 0 or b == 0:
+        return(0)
+    return(_EXP[_LOG[a] + _LOG[b]])
+
+
+def gf_div(a, b):
+    if a == 0:
+        return(0)
+    return(_EXP[(_LOG[a] - _LOG[b]) % 255])
+
+
+def gf_pot(e):
+    """ alfa^e """
+    return(_EXP[e % 255])
+
+
+def poly_avalia(p, x):
+    """ p em ordem crescente de grau """
+    y = 0
+    for c in reversed(p):
+        y = gf_mul(y, x) ^ c
+    return(y)
+
+
+class ReedSolomon(object):
+    """ RS(n, n - paridade) sobre GF(256), encurtado
+
+    Quadros maiores que 255 - paridade bytes são divididos
+    em várias palavras intercaladas byte a byte; a
+    paridade de todas vai no fim do quadro, também
+    intercalada. O receptor deduz o número de palavras do
+    tamanho do quadro.
+    """
+
+    def __init__(self, paridade=16, profundidade=1):
+        self.paridade      = paridade
+        self.profundidade  = profundidade
+        self.kmax          = 255 - paridade
+        self.corrigidos    = 0
+        self.incorrigiveis = 0
+        # gerador: prod (x - alfa^j), j = 0..paridade-1, grau maior primeiro
+        g = [1]
+        for j in range(paridade):
+            r = [0] * (len(g) + 1)
+            for i, c in enumerate(g):
+                r[i] ^= c
+                r[i + 1] ^= gf_mul(c, gf_pot(j))
+            g = r
+        # RESTO[g] = log de (x^g mod gerador), para g = 0..254: a
+        # paridade é a soma dos restos de cada byte da mensagem
+        resto = [0] * (paridade - 1) + [1]
+        restos = []
+        for grau in range(255):
+            restos.append([_LOG[c] for c in resto] if grau >= paridade else [510] * paridade)
+            fb = resto[0]
+            resto = resto[1:] + [0]
+            resto = [r ^ gf_mul(fb, c) for r, c in zip(resto, g[1:])]
+        self.RESTO = np.array(restos, np.int64)
+
+    def palavras(self, m):
+        return(max(self.profundidade, -(-m // self.kmax)))
+
+    def codifica(self, data):
+        a = np.frombuffer(data, np.uint8)
+        d = self.palavras(len(a))
+        msgs = self.matriz([a[j::d] for j in range(d)])
+        # grau do byte i da mensagem na palavra: paridade + k-1-i
+        k = msgs.shape[1]
+        restos = self.RESTO[self.paridade:self.paridade + k][::-1]
+        par = np.bitwise_xor.reduce(EXP[LOG[msgs][:, :, None] + restos[None]], axis=1)
+        # paridade intercalada: byte p da palavra j em m + p*d + j
+        return(bytes(data) + par.T.tobytes())
+
+    @staticmethod
+    def matriz(linhas):
+        """ Linhas alinhadas à direita (zeros à esquerda não mudam o código) """
+        n = max([len(l) for l in linhas])
+        m = np.zeros((len(linhas), n), np.uint8)
+        for j, l in enumerate(linhas):
+            m[j, n - len(l):] = l
+        return(m)
+
+    def sindromes(self, cw):
+        """ S_j = c(alfa^j) de todas as palavras de uma vez """
+        n = cw.shape[1]
+        pesos = POT[n - 1::-1, :self.paridade]
+        return(np.bitwise_xor.reduce(EXP[LOG[cw][:, :, None] + pesos[None]], axis=1))
+
+    def decodifica(self, data):
+        a = np.frombuffer(data, np.uint8)
+        E = len(a)
+        d = self.profundidade
+        while True:
+            m = E - d * self.paridade
+            if m < 0:
+                self.incorrigiveis += 1
+                return(None)
+            if self.palavras(m) == d:
+                break
+            d += 1
+        linhas = [np.concatenate((a[j:m:d], a[m + j::d])) for j in range(d)]
+        cw = self.matriz(linhas)
+        s = self.sindromes(cw)
+        erradas = np.flatnonzero(s.any(axis=1))
+        if len(erradas) == 0:
+            return(bytes(a[:m]))
+        saida = bytearray(a[:m])
+        for j in erradas.tolist():
+            n = len(linhas[j])
+            palavra = cw[j, cw.shape[1] - n:].tolist()
+            erros = self.corrige(palavra, s[j].tolist())
+            if erros is None:
+                self.incorrigiveis += 1
+                return(None)
+            self.corrigidos += erros
+            saida[j:m:d] = bytes(palavra[:n - self.paridade])
+        return(bytes(saida))
+
+    def corrige(self, palavra, S):
+        """ Corrige palavra (lista, grau maior primeiro) no lugar
+
+        Retorna o número de bytes corrigidos ou None.
+        """
+        n = len(palavra)
+        # Berlekamp-Massey: localizador Λ(x), grau menor primeiro
+        C, B = [1], [1]
+        L, m, b = 0, 1, 1
+        for k in range(self.paridade):
+            delta = S[k]
+            for i in range(1, L + 1):
+                delta ^= gf_mul(C[i], S[k - i])
+            if delta == 0:
+                m += 1
+                continue
+            coef = gf_div(delta, b)
+            T = C[:]
+            C = C + [0] * max(0, len(B) + m - len(C))
+            for i, c in enumerate(B):
+                C[i + m] ^= gf_mul(coef, c)
+            if 2 * L <= k:
+                L, B, b, m = k + 1 - L, T, delta, 1
+            else:
+                m += 1
+        C = C[:L + 1]
+        if 2 * L > self.paridade:
+            return(None)
+        # Chien: raízes de Λ em alfa^-p, p = grau do coeficiente
+        posicoes = [p for p in range(n) if poly_avalia(C, gf_pot(-p)) == 0]
+        if len(posicoes) != L:
+            return(None)
+        # Forney: Ω = S·Λ mod x^paridade, e = X·Ω(X^-1)/Λ'(X^-1)
+        omega = [0] * self.paridade
+        for i, c in enumerate(C):
+            for k in range(self.paridade - i):
+                omega[i + k] ^= gf_mul(c, S[k])
+        derivada = [C[i] if i % 2 else 0 for i in range(1, len(C))]
+        for p in posicoes:
+            Xinv = gf_pot(-p)
+            den = poly_avalia(derivada, Xinv)
+            if den == 0:
+                return(None)
+            e = gf_mul(gf_pot(p), gf_div(poly_avalia(omega, Xinv), den))
+            palavra[n - 1 - p] ^= e
+        return(L)
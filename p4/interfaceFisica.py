@@ -6,18 +6,79 @@
 #17/02/2018
 ####################################################
 
+# Importa pacote de tempo
+import time
+
+# Threads
+import threading
+
 # Importa pacote de comunicação serial
 import serial
 
 # importa pacote para conversão binário ascii
 import binascii
 
+# Estatísticas
+from metricas import Metricas
+
+#################################
+# Enquadramento SLIP (modo raw) #
+#################################
+SLIP_END     = b'\xC0'
+SLIP_ESC     = b'\xDB'
+SLIP_ESC_END = b'\xDB\xDC'
+SLIP_ESC_ESC = b'\xDB\xDD'
+
+# primeiro byte de cada quadro raw
+QUADRO_DADOS  = 0
+QUADRO_SONDA  = 1
+QUADRO_ACEITE = 2
+QUADRO_FEC    = 3  # dados codificados por fisica.fec (ver fec.py)
+
+# versão do modo raw anunciada na negociação
+VERSAO_RAW = 1
+
+# bytes que nunca aparecem no modo hex
+NAO_HEX = bytes(sorted(set(range(256)) - set(b"0123456789abcdefABCDEF")))
+
+
+def slipEncode(data):
+    """ Escapa END e ESC para que END só apareça
+    como delimitador de quadro.
+    """
+    data = bytes(data).replace(SLIP_ESC, SLIP_ESC_ESC)
+    return(data.replace(SLIP_END, SLIP_ESC_END))
+
+
+def slipDecode(data, tolerante=False):
+    """ Desfaz o escape de um quadro SLIP.
+
+    Retorna None se o quadro tiver um ESC inválido
+    (linha corrompida). Com tolerante=True o ESC
+    inválido fica como está e o quadro segue para o
+    FEC; isso só ajuda quando o tamanho do quadro não
+    muda. Um bit que cria ou desfaz um escape de verdade
+    encurta ou alonga o quadro, e aí o FEC também falha
+    (quadro descartado, o pacote é reenviado).
+    """
+    nEsc = data.count(SLIP_ESC)
+    if not tolerante and nEsc != data.count(SLIP_ESC_END) + data.count(SLIP_ESC_ESC):
+        return(None)
+    return(data.replace(SLIP_ESC_END, SLIP_END).replace(SLIP_ESC_ESC, SLIP_ESC))
+
+
+def slipQuadro(tipo, data=b""):
+    return(SLIP_END + slipEncode(bytes([tipo]) + data) + SLIP_END)
+
+
 #################################
 # Interface com a camada física #
 #################################
 class fisica(object):
-    def __init__(self, name):
+    def __init__(self, name, modo='hex', transporte=None, metricas=None, fec=None):
         self.name        = name
+        # sem transporte usa a porta serial name (ver transporte.py)
+        self.transporte  = transporte
         self.port        = None
         self.baudrate    = 115200
         #self.baudrate    = 9600
@@ -26,8 +87,22 @@ class fisica(object):
         self.stop        = serial.STOPBITS_ONE
         self.timeout     = 0.1
         self.rxRemain    = b""
+        # 'hex' é compatível com o lado arduino antigo,
+        # 'raw' envia os bytes sem codificar (quadros SLIP)
+        self.modo        = modo
+        self.rxQuadro    = b""
+        self.txControle  = []
+        self.errosDecode = 0
+        # código corretor dos quadros raw (fec.Hamming74, Secded, ReedSolomon)
+        self.fec         = fec
+        self.metricas    = metricas if metricas is not None else Metricas()
+        # RX também escreve (aceites), então os writes são serializados
+        self.txLock      = threading.Lock()
 
     def open(self):
+        if self.transporte is not None:
+            self.port = self.transporte
+            return
         self.port = serial.Serial(self.name,
                                   self.baudrate,
                                   self.bytesize,
@@ -40,8 +115,8 @@ class fisica(object):
         self.port.close()
 
     def flush(self):
-        self.port.flushInput()
-        self.port.flushOutput()
+        self.port.reset_input_buffer()
+        self.port.reset_output_buffer()
 
     def encode(self, data):
         encoded = binascii.hexlify(data)
@@ -53,6 +128,41 @@ class fisica(object):
         decoded = binascii.unhexlify(data)
         return(decoded)
 
+    def negocia(self, timeout=1.0):
+        """ Tenta passar para o modo raw
+
+        Envia sondas SLIP até o timeout. Se o outro lado
+        também falar raw, ele responde com uma sonda ou
+        um aceite e os dois passam a usar o modo raw.
+        Um par antigo (só hex) descarta as sondas como
+        erro de decodificação e o modo continua 'hex'.
+        As sondas têm tamanho par para não desalinhar
+        o rxRemain do lado antigo.
+        Deve ser chamado antes de iniciar RX/TX.
+        """
+        sonda  = slipQuadro(QUADRO_SONDA, bytes([VERSAO_RAW]))
+        fim    = time.monotonic() + timeout
+        proxima = 0
+        buffer = b""
+        while time.monotonic() < fim:
+            if time.monotonic() >= proxima:
+                self.writeQuadro(sonda)
+                proxima = time.monotonic() + 0.2
+            buffer += self.port.read(max(1, self.port.in_waiting))
+            *quadros, resto = buffer.split(SLIP_END)
+            for i, quadro in enumerate(quadros):
+                quadro = slipDecode(quadro)
+                if not quadro or quadro[0] not in (QUADRO_SONDA, QUADRO_ACEITE):
+                    continue
+                if quadro[0] == QUADRO_SONDA:
+                    self.writeQuadro(slipQuadro(QUADRO_ACEITE, bytes([VERSAO_RAW])))
+                # o que chegou depois já é tráfego raw
+                self.rxQuadro = SLIP_END.join(quadros[i + 1:] + [resto])
+                self.modo = 'raw'
+                return(True)
+            buffer = resto
+        return(False)
+
     def write(self, txBuffer):
         """ Write data to serial port
 
@@ -61,19 +171,67 @@ class fisica(object):
         because the pyserial and arduino uses
         Software flow control between both
         sides of communication.
+        In raw mode the buffer goes unchanged
+        inside a SLIP frame.
         """
-        nTx = self.port.write(self.encode(txBuffer))
-        self.port.flush()
+        with self.txLock:
+            nTx = self.port.write(self.codifica(txBuffer))
+            self.port.flush()
+        if self.modo == 'raw':
+            return(len(txBuffer))
         return(nTx/2)
 
+    def writeLote(self, txBuffers):
+        """ Escreve vários buffers em um único write da porta
+
+        Cada buffer é codificado separadamente (no modo raw
+        vira seu próprio quadro SLIP), então o outro lado
+        recebe cada um assim que ele chega, sem esperar o lote.
+        """
+        with self.txLock:
+            self.port.write(b"".join([self.codifica(b) for b in txBuffers]))
+            self.port.flush()
+        return(sum([len(b) for b in txBuffers]))
+
+    def writeQuadro(self, quadro):
+        with self.txLock:
+            self.port.write(quadro)
+            self.port.flush()
+
+    def codifica(self, txBuffer):
+        """ Bytes que vão para a linha no modo atual """
+        if self.modo == 'raw' and self.fec is not None:
+            return(slipQuadro(QUADRO_FEC, self.fec.codifica(txBuffer)))
+        if self.modo == 'raw':
+            return(slipQuadro(QUADRO_DADOS, txBuffer))
+        return(self.encode(txBuffer))
+
     def read(self, nBytes):
         """ Read nBytes from the UART com port
 
+        Bloqueia só até o primeiro byte (ou o timeout
+        da porta) e depois leva o que já estiver na
+        fila da UART, sem esperar completar nBytes.
+        """
+        nDisp    = max(1, min(nBytes, self.port.in_waiting))
+        rxBuffer = self.port.read(nDisp)
+        rxBufferDecoded, nRx = self.decodifica(rxBuffer)
+        # aceites para quem ainda está negociando o modo raw
+        while self.txControle:
+            self.writeQuadro(self.txControle.pop(0))
+        return(rxBufferDecoded, nRx)
+
+    def decodifica(self, rxBuffer):
+        """ Decodifica bytes crus lidos da linha
+
         Nem toda a leitura retorna múltiplo de 2
         devemos verificar isso para evitar que a funcao
         self.decode seja chamada com números ímpares.
+        Quadros de controle a responder ficam em
+        self.txControle para quem faz a escrita.
         """
-        rxBuffer = self.port.read(nBytes)
+        if self.modo == 'raw':
+            return(self.decodificaRaw(rxBuffer))
         rxBufferConcat = self.rxRemain + rxBuffer
         nValid = (len(rxBufferConcat)//2)*2
         rxBufferValid = rxBufferConcat[0:nValid]
@@ -84,12 +242,52 @@ class fisica(object):
             em parte esses erros. Melhorar futuramente."""
             "muitas vezes um flush no inicio resolve!"
             rxBufferDecoded = self.decode(rxBufferValid)
-    
-            
-            
+
+
+
             nRx = len(rxBuffer)
             return(rxBufferDecoded, nRx)
-        except :
+        except binascii.Error:
+            # descarta só os bytes que não são hex (ruído, sondas
+            # de negociação) em vez de perder a leitura inteira
+            self.errosDecode += 1
+            self.metricas.erroDecode()
             print("[ERRO] interfaceFisica, read, decode. buffer : {}".format(rxBufferValid))
-            return(b"", 0)
+            rxBufferConcat = rxBufferValid.translate(None, NAO_HEX) + self.rxRemain
+            nValid = (len(rxBufferConcat)//2)*2
+            self.rxRemain = rxBufferConcat[nValid:]
+            return(self.decode(rxBufferConcat[0:nValid]), len(rxBuffer))
+
+    def decodificaRaw(self, rxBuffer):
+        """ Extrai os quadros SLIP completos
+
+        Quadros corrompidos são contados e descartados;
+        o próximo END ressincroniza a leitura.
+        """
+        *quadros, self.rxQuadro = (self.rxQuadro + rxBuffer).split(SLIP_END)
+        dados = []
+        for quadro in quadros:
+            if not quadro:
+                continue
+            quadro = slipDecode(quadro, self.fec is not None)
+            if not quadro:
+                self.errosDecode += 1
+                self.metricas.erroDecode()
+                print("[ERRO] interfaceFisica, read, quadro SLIP invalido")
+            elif quadro[0] == QUADRO_DADOS:
+                dados.append(quadro[1:])
+            elif quadro[0] == QUADRO_FEC and self.fec is not None:
+                dados.append(self.decodificaFec(quadro[1:]))
+            elif quadro[0] == QUADRO_SONDA:
+                # o outro lado ainda está negociando
+                self.txControle.append(slipQuadro(QUADRO_ACEITE, bytes([VERSAO_RAW])))
+        return(b"".join(dados), len(rxBuffer))
 
+    def decodificaFec(self, quadro):
+        corrigidos = self.fec.corrigidos
+        data = self.fec.decodifica(quadro)
+        self.metricas.fec(self.fec.corrigidos - corrigidos, data is None)
+        if data is None:
+            print("[ERRO] interfaceFisica, read, quadro FEC sem correcao")
+            return(b"")
+        return(data)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Estatísticas e rastro do enlace
+####################################################
+""" Contadores, histogramas e rastro binário do enlace
+
+Cada enlace tem um objeto Metricas (enlace.metricas)
+que RX, TX, fisica e Transferencia alimentam, cada um
+da sua thread: os contadores só mudam pelos métodos
+daqui, que seguram metricas.lock.
+O rastro é opcional: metricas.ativaRastro() passa a
+guardar um registro de 16 bytes por evento de pacote,
+que pode ser salvo e reproduzido depois:
+
+    python metricas.py rastro.bin     # lista os eventos
+"""
+
+import sys
+import time
+import struct
+import threading
+
+# eventos do rastro
+EV_ENVIO       = 1
+EV_RECEB       = 2
+EV_ERRO_CRC    = 3
+EV_REENVIO     = 4
+EV_ERRO_DECODE = 5
+NOMES_EVENTOS  = {EV_ENVIO: 'envio', EV_RECEB: 'receb', EV_ERRO_CRC: 'erro_crc',
+                  EV_REENVIO: 'reenvio', EV_ERRO_DECODE: 'erro_decode'}
+
+
+class Histograma(object):
+    """ Histograma de tempos com baldes em potências de 2 de microssegundo """
+
+    def __init__(self):
+        self.baldes = [0] * 32
+        self.n      = 0
+        self.soma   = 0.0
+        self.maximo = 0.0
+
+    def adiciona(self, segundos):
+        us = int(segundos * 1e6)
+        self.baldes[min(31, us.bit_length())] += 1
+        self.n      += 1
+        self.soma   += segundos
+        self.maximo  = max(self.maximo, segundos)
+
+    def percentil(self, p):
+        """ Limite superior (s) do balde que contém o percentil p """
+        if self.n == 0:
+            return(0.0)
+        alvo  = p / 100 * self.n
+        soma  = 0
+        for i, c in enumerate(self.baldes):
+            soma += c
+            if soma >= alvo:
+                return(min(self.maximo, (1 << i) / 1e6))
+        return(self.maximo)
+
+    def resumo(self):
+        return({'n': self.n,
+                'media': self.soma / self.n if self.n else 0.0,
+                'p50': self.percentil(50),
+                'p99': self.percentil(99),
+                'max': self.maximo})
+
+
+class Rastro(object):
+    """ Registro binário de eventos de pacote
+
+    Cada evento: instante (double), evento, tipo, id,
+    total e tamanho. Ao passar de maxEventos os novos
+    são só contados em perdidos.
+    """
+
+    REGISTRO = struct.Struct('<dBBHHH')
+
+    def __init__(self, maxEventos=1000000):
+        self.dados     = bytearray()
+        self.maxBytes  = maxEventos * self.REGISTRO.size
+        self.perdidos  = 0
+        self.lock      = threading.Lock()
+
+    def registra(self, evento, tipo=0, id=0, total=0, tamanho=0):
+        registro = self.REGISTRO.pack(time.time(), evento, tipo, id & 0xFFFF,
+                                      total & 0xFFFF, min(tamanho, 0xFFFF))
+        with self.lock:
+            if len(self.dados) >= self.maxBytes:
+                self.perdidos += 1
+                return
+            self.dados += registro
+
+    def eventos(self):
+        """ Tuplas (instante, evento, tipo, id, total, tamanho) """
+        return(self.REGISTRO.iter_unpack(bytes(self.dados)))
+
+    def salva(self, caminho):
+        with open(caminho, 'wb') as f:
+            f.write(self.dados)
+
+    @classmethod
+    def carrega(cls, caminho):
+        rastro = cls()
+        with open(caminho, 'rb') as f:
+            rastro.dados = bytearray(f.read())
+        if len(rastro.dados) % cls.REGISTRO.size:
+            raise ValueError('{}: rastro truncado ({} bytes não é múltiplo de {})'.format(
+                caminho, len(rastro.dados), cls.REGISTRO.size))
+        return(rastro)
+
+    def reproduz(self, funcao, velocidade=1.0):
+        """ Chama funcao(evento) respeitando os intervalos originais
+
+        velocidade=0 reproduz sem esperar.
+        """
+        inicio = None
+        for evento in self.eventos():
+            if inicio is None:
+                inicio = (evento[0], time.monotonic())
+            elif velocidade > 0:
+                atraso = (evento[0] - inicio[0]) / velocidade - (time.monotonic() - inicio[1])
+                if atraso > 0:
+                    time.sleep(atraso)
+            funcao(evento)
+
+
+class Metricas(object):
+
+    def __init__(self):
+        self.bytesTx          = 0
+        self.bytesRx          = 0
+        self.quadrosTx        = 0
+        self.quadrosRx        = 0
+        self.errosCrc         = 0
+        self.errosDecode      = 0
+        self.retransmissoes   = 0
+        self.fecCorrigidos    = 0   # erros corrigidos pelo FEC da fisica
+        self.fecIncorrigiveis = 0   # quadros FEC descartados
+        self.rxMaximo         = 0   # maior ocupação do buffer do RX
+        self.filaMaxima       = 0   # maior fila de pacotes à espera (multiplexador)
+        self.tempoBloqueadoRx = 0.0 # tempo total esperando em getNData
+        self.latenciaRx       = Histograma()  # duração de cada getNData
+        self.latenciaTx       = Histograma()  # de sendBuffer até o write
+        self.rastro           = None
+        self.lock             = threading.Lock()
+
+    def ativaRastro(self, maxEventos=1000000):
+        self.rastro = Rastro(maxEventos)
+        return(self.rastro)
+
+    def soma(self, **contadores):
+        """ Soma aos contadores, ex.: soma(bytesRx=n) """
+        with self.lock:
+            for nome, valor in contadores.items():
+                setattr(self, nome, getattr(self, nome) + valor)
+
+    def ocupacaoRx(self, n):
+        """ Ocupação atual do buffer do RX (guarda a maior) """
+        with self.lock:
+            if n > self.rxMaximo:
+                self.rxMaximo = n
+
+    def ocupacaoFila(self, n):
+        """ Pacotes recebidos esperando quem os leia (guarda o maior) """
+        with self.lock:
+            if n > self.filaMaxima:
+                self.filaMaxima = n
+
+    def esperaRx(self, segundos):
+        """ Uma chamada a getNData que levou segundos """
+        with self.lock:
+            self.tempoBloqueadoRx += segundos
+            self.latenciaRx.adiciona(segundos)
+
+    def envioTx(self, tamanho, segundos):
+        """ tamanho bytes escritos segundos depois de enfileirados """
+        with self.lock:
+            self.bytesTx += tamanho
+            self.latenciaTx.adiciona(segundos)
+
+    def quadro(self, evento, tipo, id, total, tamanho):
+        """ Pacote enviado ou recebido pela Transferencia """
+        with self.lock:
+            if evento == EV_ENVIO:
+                self.quadrosTx += 1
+            elif evento == EV_RECEB:
+                self.quadrosRx += 1
+            elif evento == EV_ERRO_CRC:
+                self.errosCrc += 1
+            elif evento == EV_REENVIO:
+                self.retransmissoes += 1
+        if self.rastro is not None:
+            self.rastro.registra(evento, tipo, id, total, tamanho)
+
+    def erroDecode(self):
+        with self.lock:
+            self.errosDecode += 1
+        if self.rastro is not None:
+            self.rastro.registra(EV_ERRO_DECODE)
+
+    def fec(self, corrigidos, incorrigivel):
+        with self.lock:
+            self.fecCorrigidos    += corrigidos
+            self.fecIncorrigiveis += incorrigivel
+
+    def resumo(self):
+        with self.lock:
+            return({'bytesTx':          self.bytesTx,
+                    'bytesRx':          self.bytesRx,
+                    'quadrosTx':        self.quadrosTx,
+                    'quadrosRx':        self.quadrosRx,
+                    'errosCrc':         self.errosCrc,
+                    'errosDecode':      self.errosDecode,
+                    'retransmissoes':   self.retransmissoes,
+                    'fecCorrigidos':    self.fecCorrigidos,
+                    'fecIncorrigiveis': self.fecIncorrigiveis,
+                    'rxMaximo':         self.rxMaximo,
+                    'filaMaxima':       self.filaMaxima,
+                    'tempoBloqueadoRx': self.tempoBloqueadoRx,
+                    'latenciaRx':       self.latenciaRx.resumo(),
+                    'latenciaTx':       self.latenciaTx.resumo()})
+
+    def __str__(self):
+        r = self.resumo()
+        return('tx {bytesTx} B / {quadrosTx} pacotes, rx {bytesRx} B / {quadrosRx} pacotes, '
+               'crc {errosCrc}, decode {errosDecode}, reenvios {retransmissoes}, '
+               'fec {fecCorrigidos} corrigidos / {fecIncorrigiveis} perdidos, '
+               'buffer rx max {rxMaximo} B, bloqueado {tempoBloqueadoRx:.3f} s'.format(**r))
+
+
+def main():
+    if len(sys.argv) < 2:
+        print('uso: python metricas.py RASTRO')
+        return
+    try:
+        rastro = Rastro.carrega(sys.argv[1])
+    except ValueError as e:
+        print(e)
+        return
+    inicio = None
+    for instante, evento, tipo, id, total, tamanho in rastro.eventos():
+        inicio = instante if inicio is None else inicio
+        print('{:10.4f} {:<12} tipo {} id {}/{} {} B'.format(
+            instante - inicio, NOMES_EVENTOS.get(evento, evento), tipo, id, total, tamanho))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Várias portas em uma única thread de I/O
+####################################################
+""" Multiplexador de portas com selectors
+
+Cada enlace tem duas threads (RX e TX) e o RX acorda
+a cada leitura mesmo sem tráfego. Com dezenas de placas
+isso vira dezenas de threads disputando o GIL. Aqui uma
+única thread espera em select() por todas as portas e
+só acorda quando alguma tem dados (ou quando há algo a
+escrever), então com as linhas paradas o custo é zero.
+
+    mux = Multiplexador()
+    mux.threadStart()
+    portas = [mux.adiciona('/dev/ttyACM{}'.format(i)) for i in range(30)]
+    portas[0].sendData(pacote).result()
+    pk = portas[3].recv_packet(timeout=1.0)
+
+Os pacotes recebidos são separados e validados na
+thread de I/O e entregues na fila de cada porta.
+Quem prefere asyncio deve usar enlaceAsync.AsyncEnlace,
+que faz o mesmo no event loop. Só funciona em POSIX e
+com transportes que escrevem direto no descritor (serial,
+pty, pipe, socket); o TransporteLimitado não serve e
+adiciona() recusa com ValueError. Uma porta com erro de
+escrita sai do multiplexador e seus envios pendentes
+falham com ConnectionError; as outras não são afetadas.
+"""
+
+import os
+import queue
+import selectors
+import threading
+import collections
+
+# Aviso de conclusão de cada envio
+from concurrent.futures import Future
+
+# Interface Física
+from interfaceFisica import fisica
+
+from pacote import Pacote
+from quadro import ExtratorQuadros
+from transporte import descritores
+
+
+class PortaMux(object):
+    """ Uma porta atendida pelo Multiplexador """
+
+    def __init__(self, mux, fisica, pacote):
+        self.mux        = mux
+        self.fisica     = fisica
+        self.metricas   = fisica.metricas
+        self.p          = pacote
+        self.pacotes    = queue.Queue()
+        self.rxBuffer   = b""
+        self.extrator   = ExtratorQuadros(pacote.EOP)
+        self.lock       = threading.Lock()
+        self.txPendente = bytearray()
+        self.txTotal    = 0
+        self.txEscritos = 0
+        self.txEsperas  = collections.deque()
+        self.fdLeitura, self.fdEscrita = descritores(fisica.port)
+        os.set_blocking(self.fdLeitura, False)
+        os.set_blocking(self.fdEscrita, False)
+
+    def sendData(self, data):
+        """ Enfileira data e retorna um Future concluído quando
+        os bytes forem escritos pela thread de I/O.
+        """
+        futuro = Future()
+        wire   = self.fisica.codifica(data)
+        with self.lock:
+            self.txPendente += wire
+            self.txTotal    += len(wire)
+            self.txEsperas.append((self.txTotal, futuro, len(data)))
+        self.mux.pedeEscrita(self)
+        return(futuro)
+
+    def recv_packet(self, timeout=None):
+        """ Próximo PacoteRecebido da porta, ou None no timeout """
+        try:
+            return(self.pacotes.get(timeout=timeout))
+        except queue.Empty:
+            return(None)
+
+    def leitura(self):
+        """ Chamada pela thread de I/O quando há dados """
+        try:
+            rxBuffer = os.read(self.fdLeitura, 4096)
+        except BlockingIOError:
+            return(True)
+        except OSError:
+            rxBuffer = b""
+        if not rxBuffer:
+            return(False)
+        data, nRx = self.fisica.decodifica(rxBuffer)
+        if self.fisica.txControle:
+            with self.lock:
+                while self.fisica.txControle:
+                    quadro = self.fisica.txControle.pop(0)
+                    self.txPendente += quadro
+                    self.txTotal    += len(quadro)
+            self.mux.pedeEscrita(self)
+        if not data:
+            return(True)
+        self.metricas.soma(bytesRx=len(data))
+        if self.p.stuffing:
+            pacotes = [self.p.le_quadro(q) for q in self.extrator.alimenta(data)]
+            pacotes = [pk for pk in pacotes if pk is not None]
+        else:
+            self.rxBuffer += data
+            self.metricas.ocupacaoRx(len(self.rxBuffer))
+            pacotes, consumido, erros = self.p.desempacotar(self.rxBuffer)
+            self.rxBuffer = self.rxBuffer[consumido:]
+        for pk in pacotes:
+            self.metricas.soma(quadrosRx=1, errosCrc=int(not pk.ok))
+            self.pacotes.put(pk._replace(payload=bytes(pk.payload)))
+        self.metricas.ocupacaoFila(self.pacotes.qsize())
+        return(True)
+
+    def escrita(self):
+        """ Chamada pela thread de I/O; retorna True se ainda falta escrever
+
+        Um erro de escrita (BrokenPipeError, por exemplo) sobe
+        como OSError para o Multiplexador tirar a porta.
+        """
+        with self.lock:
+            try:
+                n = os.write(self.fdEscrita, self.txPendente)
+            except BlockingIOError:
+                n = 0
+            del self.txPendente[:n]
+            self.txEscritos += n
+            prontos = []
+            while self.txEsperas and self.txEsperas[0][0] <= self.txEscritos:
+                prontos.append(self.txEsperas.popleft())
+            falta = len(self.txPendente) > 0
+        for marca, futuro, tamanho in prontos:
+            self.metricas.soma(bytesTx=tamanho)
+            if not futuro.done():
+                futuro.set_result(tamanho)
+        return(falta)
+
+    def falha(self, erro):
+        """ Descarta o que falta escrever e falha os envios pendentes """
+        with self.lock:
+            self.txPendente.clear()
+            self.txEscritos = self.txTotal
+            pendentes, self.txEsperas = self.txEsperas, collections.deque()
+        for marca, futuro, tamanho in pendentes:
+            if not futuro.done():
+                futuro.set_exception(ConnectionError('porta fora do multiplexador: {}'.format(erro)))
+
+
+class Multiplexador(object):
+
+    def __init__(self):
+        self.seletor    = selectors.DefaultSelector()
+        self.mascaras   = {}
+        self.portas     = []
+        self.pedidos    = collections.deque()
+        self.threadStop = False
+        # self-pipe para acordar o select quando outra thread pede algo
+        self.rAcorda, self.wAcorda = os.pipe()
+        os.set_blocking(self.rAcorda, False)
+        os.set_blocking(self.wAcorda, False)
+        self.seletor.register(self.rAcorda, selectors.EVENT_READ, None)
+
+    def adiciona(self, name, modo='hex', transporte=None, pacote=None):
+        """ Abre a porta e passa a atendê-la; retorna a PortaMux """
+        f = fisica(name, modo, transporte)
+        f.open()
+        try:
+            porta = PortaMux(self, f, pacote if pacote is not None else Pacote())
+        except ValueError:
+            # transporte sem descritor (ex.: TransporteLimitado)
+            f.close()
+            raise
+        self.portas.append(porta)
+        self.pede(('leitura', porta))
+        return(porta)
+
+    def remove(self, porta):
+        self.pede(('remove', porta))
+
+    def pedeEscrita(self, porta):
+        self.pede(('escrita', porta))
+
+    def pede(self, pedido):
+        self.pedidos.append(pedido)
+        try:
+            os.write(self.wAcorda, b"\0")
+        except BlockingIOError:
+            pass  # já há um aviso pendente
+
+    ####################
+    # thread de I/O    #
+    ####################
+
+    def ajusta(self, fd, porta, evento, liga):
+        antiga = self.mascaras.get(fd, 0)
+        nova   = antiga | evento if liga else antiga & ~evento
+        if nova == antiga:
+            return
+        if antiga == 0:
+            self.seletor.register(fd, nova, porta)
+        elif nova == 0:
+            self.seletor.unregister(fd)
+        else:
+            self.seletor.modify(fd, nova, porta)
+        if nova:
+            self.mascaras[fd] = nova
+        else:
+            del self.mascaras[fd]
+
+    def atendePedidos(self):
+        try:
+            while os.read(self.rAcorda, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        while self.pedidos:
+            pedido, porta = self.pedidos.popleft()
+            if pedido == 'leitura':
+                self.ajusta(porta.fdLeitura, porta, selectors.EVENT_READ, True)
+            elif pedido == 'escrita':
+                if porta not in self.portas:
+                    # envio depois do remove (ou de um erro na porta)
+                    porta.falha('porta removida')
+                    continue
+                try:
+                    if porta.escrita():
+                        self.ajusta(porta.fdEscrita, porta, selectors.EVENT_WRITE, True)
+                except OSError as erro:
+                    self.tira(porta, erro)
+            elif pedido == 'remove' and porta in self.portas:
+                self.tira(porta, 'porta removida')
+
+    def tira(self, porta, erro):
+        """ Para de atender a porta, fecha e falha os envios pendentes
+
+        Só a porta com problema sai; as outras continuam
+        sendo atendidas pela mesma thread.
+        """
+        self.ajusta(porta.fdLeitura, porta, selectors.EVENT_READ, False)
+        self.ajusta(porta.fdEscrita, porta, selectors.EVENT_WRITE, False)
+        self.portas.remove(porta)
+        porta.falha(erro)
+        try:
+            porta.fisica.close()
+        except OSError:
+            pass
+
+    def passo(self, timeout=None):
+        """ Uma rodada de select; pode ser chamada de fora no lugar da thread """
+        for chave, eventos in self.seletor.select(timeout):
+            porta = chave.data
+            if porta is None:
+                self.atendePedidos()
+                continue
+            if porta not in self.portas:
+                continue  # tirada por erro no mesmo select (fdLeitura == fdEscrita)
+            try:
+                if eventos & selectors.EVENT_READ and chave.fd == porta.fdLeitura:
+                    if not porta.leitura():
+                        # o outro lado fechou
+                        self.ajusta(porta.fdLeitura, porta, selectors.EVENT_READ, False)
+                if eventos & selectors.EVENT_WRITE and chave.fd == porta.fdEscrita:
+                    if not porta.escrita():
+                        self.ajusta(porta.fdEscrita, porta, selectors.EVENT_WRITE, False)
+            except OSError as erro:
+                self.tira(porta, erro)
+
+    def thread(self):
+        while not self.threadStop:
+            self.passo()
+
+    def threadStart(self):
+        self.thread = threading.Thread(target=self.thread, args=(), daemon=True)
+        self.thread.start()
+
+    def threadKill(self):
+        self.threadStop = True
+        self.pede(('nada', None))
@@ -1,8 +1,28 @@
 import os
+import mmap
+import struct
+import binascii
+import collections
+
+from quadro import stuff, unstuff
+
+
+# pacote validado por Pacote.desempacotar; payload é um memoryview do buffer
+PacoteRecebido = collections.namedtuple(
+    'PacoteRecebido', ['tipo', 'id', 'total', 'flags', 'crc', 'payload', 'ok'])
+
+
+def crc16(data):
+    """ CRC-16/CCITT-FALSE (polinômio 0x1021, início 0xFFFF)
+
+    binascii.crc_hqx é a implementação por tabela
+    de consulta (256 entradas) da biblioteca padrão.
+    """
+    return(binascii.crc_hqx(data, 0xFFFF))
 
 
 class Pacote(object):
-    def __init__(self):
+    def __init__(self, tamanho_payload=114, stuffing=False):
         self.EOP = b'\xAF\x8E\xFF\x02'
         self.hdr_len = 10
 
@@ -11,9 +31,137 @@ class Pacote(object):
         self.PAUSE =    3
         self.ABORT =    4
         self.FIN =      5
-    
-    def cria_header(self, tipo, id, crc, ):
+        self.DADOS =    6
+        self.ERRO =     7  # CRC ou ordem errada, pede reenvio
+        self.tipos = {self.HELLO, self.ACK, self.PAUSE, self.ABORT,
+                      self.FIN, self.DADOS, self.ERRO}
+
+        # tipo, id, total de pacotes, tamanho do payload, crc16, flags
+        # (o crc16 cobre o header, com o campo crc zerado, e o payload)
+        self.header = struct.Struct('>BHHHHB')
+        # 114 + header + EOP = pacotes de 128 bytes
+        self.tamanho_payload = tamanho_payload
+        # maior payload de controle (o HELLO da Transferencia); os
+        # pacotes de controle não dependem de tamanho_payload
+        self.tamanho_controle = 19
+        if tamanho_payload < self.tamanho_controle:
+            raise ValueError('tamanho_payload {} menor que o payload de controle ({} bytes)'.format(
+                tamanho_payload, self.tamanho_controle))
+        # com stuffing o pacote é delimitado só pelo EOP (ver quadro.py)
+        # e deve ser lido com quadro.ExtratorQuadros + le_quadro
+        self.stuffing = stuffing
+
+    def cria_header(self, tipo, id, total, tamanho, crc, flags=0):
+        return(self.header.pack(tipo, id, total, tamanho, crc, flags))
+
+    def le_header(self, buffer, offset=0):
+        """ Retorna (tipo, id, total, tamanho, crc, flags) """
+        return(self.header.unpack_from(buffer, offset))
+
+    def crc(self, tipo, id, total, tamanho, flags, payload):
+        """ CRC-16 do header (campo crc zerado) seguido do payload
+
+        Assim um id, total ou tipo corrompido também é
+        pego, e não só o payload.
+        """
+        header = self.cria_header(tipo, id, total, tamanho, 0, flags)
+        return(binascii.crc_hqx(payload, crc16(header)))
+
+    def monta(self, tipo, id=0, total=0, payload=b'', flags=0):
+        """ header + payload + EOP em uma única cópia """
+        tamanho = len(payload)
+        crc = self.crc(tipo, id, total, tamanho, flags, payload)
+        header = self.cria_header(tipo, id, total, tamanho, crc, flags)
+        if self.stuffing:
+            return(b''.join((stuff(header), stuff(payload), self.EOP)))
+        return(b''.join((header, payload, self.EOP)))
+
+    def header_de(self, pacote):
+        """ Header de um pacote montado por monta """
+        if self.stuffing:
+            # 2*hdr_len bytes com stuffing contêm o header inteiro
+            pacote = unstuff(pacote[:2 * self.hdr_len])
+        return(self.le_header(pacote))
+
+    def le_quadro(self, quadro):
+        """ PacoteRecebido de um quadro já sem EOP e sem stuffing
+
+        Retorna None se o quadro não tiver o formato de um
+        pacote (curto, tipo ou tamanho inválidos).
+        """
+        if len(quadro) < self.hdr_len:
+            return(None)
+        tipo, id, total, tamanho, crc, flags = self.header.unpack_from(quadro)
+        if tipo not in self.tipos or tamanho != len(quadro) - self.hdr_len:
+            return(None)
+        payload = quadro[self.hdr_len:]
+        return(PacoteRecebido(tipo, id, total, flags, crc, payload,
+                              self.crc(tipo, id, total, tamanho, flags, payload) == crc))
+
+    def total_pacotes(self, tamanho):
+        return(max(1, -(-tamanho // self.tamanho_payload)))
+
+    def empacotar(self, caminho):
+        """ Gera os pacotes de dados do arquivo, em ordem
+
+        O arquivo é mapeado em memória (mmap) e cada
+        payload é um memoryview dele, então o único byte
+        copiado é o do pacote montado.
+        """
+        with open(caminho, 'rb') as f:
+            tamanho = os.fstat(f.fileno()).st_size
+            total = self.total_pacotes(tamanho)
+            if total > 0xFFFF:
+                raise ValueError('arquivo grande demais: {} pacotes'.format(total))
+            if tamanho == 0:
+                yield self.monta(self.DADOS, 1, 1)
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                for id in range(1, total + 1):
+                    yield self.pacote_dados(view, id, total)
+
+    def pacote_dados(self, view, id, total):
+        """ Monta o pacote de dados id (1..total) a partir do
+        memoryview do arquivo inteiro, sem copiar o trecho.
+        """
+        P = self.tamanho_payload
+        with view[(id - 1) * P:id * P] as payload:
+            return(self.monta(self.DADOS, id, total, payload))
 
+    def desempacotar(self, buffer):
+        """ Valida todos os pacotes completos de um buffer de recepção
 
-    def empacotar(self,caminho):
-        pass
\ No newline at end of file
+        buffer é bytes/bytearray com o que chegou do enlace.
+        Retorna (pacotes, consumido, erros): a lista de
+        PacoteRecebido (ok=False quando o CRC não bate),
+        quantos bytes do início do buffer já podem ser
+        descartados e quantos trechos foram pulados por
+        header ou EOP inválido. Depois de lixo a busca anda
+        byte a byte até achar um header cujo EOP confere.
+        """
+        view     = memoryview(buffer)
+        n        = len(view)
+        eop_len  = len(self.EOP)
+        pos      = 0
+        erros    = 0
+        pulando  = False
+        pacotes  = []
+        while n - pos >= self.hdr_len + eop_len:
+            tipo, id, total, tamanho, crc, flags = self.header.unpack_from(view, pos)
+            fim = pos + self.hdr_len + tamanho
+            limite = self.tamanho_payload if tipo == self.DADOS else self.tamanho_controle
+            valido = tipo in self.tipos and tamanho <= limite
+            if valido and fim + eop_len > n:
+                break  # pacote ainda incompleto
+            if not valido or view[fim:fim + eop_len] != self.EOP:
+                if not pulando:
+                    erros += 1
+                pulando = True
+                pos += 1
+                continue
+            pulando = False
+            payload = view[pos + self.hdr_len:fim]
+            ok = self.crc(tipo, id, total, tamanho, flags, payload) == crc
+            pacotes.append(PacoteRecebido(tipo, id, total, flags, crc, payload, ok))
+            pos = fim + eop_len
+        return(pacotes, pos, erros)
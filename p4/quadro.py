@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Delimitação de pacotes pelo EOP com byte stuffing
+####################################################
+""" Byte stuffing do EOP e extrator incremental de quadros
+
+Todo 0xAF (primeiro byte do EOP) dentro do quadro vira
+0xAF 0x00. Assim a sequência 0xAF 0x8E, e portanto o
+EOP, nunca aparece dentro de um quadro e o payload pode
+conter quaisquer bytes. O custo médio é 1 byte a cada 256.
+"""
+
+EOP     = b'\xAF\x8E\xFF\x02'
+ESC     = b'\xAF'
+ESC_ESC = b'\xAF\x00'
+
+
+def stuff(data):
+    return(bytes(data).replace(ESC, ESC_ESC))
+
+
+def unstuff(data):
+    return(bytes(data).replace(ESC_ESC, ESC))
+
+
+class ExtratorQuadros(object):
+    """ Separa quadros de um fluxo de bytes que chega aos pedaços
+
+    Guarda a posição até onde já procurou o EOP, então
+    cada byte é examinado uma vez só, não importa em
+    quantas leituras o quadro chegue. Os quadros são
+    memoryviews de um único bloco com tudo o que foi
+    consumido na chamada (sem cópia por quadro) quando
+    não têm escape; os que têm são desfeitos em bytes novos.
+    """
+
+    def __init__(self, eop=EOP):
+        self.eop    = eop
+        self.buffer = bytearray()
+        self.scan   = 0
+
+    def alimenta(self, data):
+        """ Adiciona data e retorna a lista de quadros completos """
+        self.buffer += data
+        limites = []
+        inicio  = 0
+        while True:
+            fim = self.buffer.find(self.eop, max(self.scan, inicio))
+            if fim < 0:
+                break
+            limites.append((inicio, fim))
+            inicio = fim + len(self.eop)
+        # o final pode ser o começo de um EOP
+        self.scan = max(0, len(self.buffer) - inicio - len(self.eop) + 1)
+        if not limites:
+            return([])
+
+        bloco = bytes(self.buffer[:inicio])
+        del self.buffer[:inicio]
+        view = memoryview(bloco)
+        quadros = []
+        for ini, fim in limites:
+            if bloco.find(ESC_ESC, ini, fim) < 0:
+                quadros.append(view[ini:fim])
+            else:
+                quadros.append(memoryview(unstuff(view[ini:fim])))
+        return(quadros)
+
+    def pendentes(self):
+        return(len(self.buffer))
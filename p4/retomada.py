@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Manifesto de blocos e retomada de transferências
+####################################################
+""" Transferências que continuam de onde pararam
+
+O arquivo é dividido em blocos de CHUNK bytes e o
+manifesto é a lista dos CRC-32 de cada bloco. O cliente
+manda no HELLO o tamanho do bloco e o CRC-32 do manifesto
+(a identidade do arquivo); o server, se já tem o
+manifesto dessa identidade em DESTINO.retomada, confere
+os blocos já gravados no destino e responde no ACK 0 a
+partir de que byte quer o resto. Se não tem, pede o
+manifesto, que vem nos primeiros pacotes de dados
+(marcados com FLAG_MANIFESTO).
+
+O destino é criado já com o tamanho final e mapeado em
+memória; cada bloco é conferido contra o manifesto assim
+que é completado. Nada de progresso é gravado: na
+retomada os blocos são conferidos de novo, então uma
+queda no meio de uma escrita não engana ninguém.
+"""
+
+import os
+import mmap
+import struct
+import binascii
+
+CHUNK = 65536
+
+# flag do header dos pacotes que carregam o manifesto
+FLAG_MANIFESTO = 0x04
+
+# tamanho do arquivo, tamanho do bloco e CRC do manifesto
+IDENTIDADE = struct.Struct('>QII')
+
+
+class Manifesto(object):
+
+    def __init__(self, tamanho, chunk, crcs):
+        self.tamanho = tamanho
+        self.chunk   = chunk
+        self.crcs    = crcs
+        self.dados   = struct.pack('>{}I'.format(len(crcs)), *crcs)
+        self.digest  = binascii.crc32(self.dados)
+
+    @classmethod
+    def de_view(cls, view, chunk=CHUNK):
+        """ Manifesto de um memoryview do arquivo inteiro (sem cópia) """
+        crcs = []
+        for inicio in range(0, len(view), chunk):
+            with view[inicio:inicio + chunk] as bloco:
+                crcs.append(binascii.crc32(bloco))
+        return(cls(len(view), chunk, crcs))
+
+    @classmethod
+    def de_dados(cls, tamanho, chunk, dados):
+        return(cls(tamanho, chunk, list(struct.unpack('>{}I'.format(len(dados) // 4), dados))))
+
+    @staticmethod
+    def tamanho_dados(tamanho, chunk):
+        """ Bytes do manifesto de um arquivo de tamanho bytes """
+        return(4 * -(-tamanho // chunk))
+
+    def confere(self, view, i):
+        with view[i * self.chunk:(i + 1) * self.chunk] as bloco:
+            return(binascii.crc32(bloco) == self.crcs[i])
+
+
+class ArquivoSaida(object):
+    """ Destino pré-alocado e mapeado em memória
+
+    escreve() grava na sequência a partir de inicio e
+    confere cada bloco completado; conclui() confere o
+    último e apaga o .retomada. Sem chunk (cliente antigo)
+    só grava, sem conferir nem retomar.
+    """
+
+    def __init__(self, caminho, tamanho, chunk=None, digest=None):
+        self.caminho   = caminho
+        self.estado    = caminho + '.retomada'
+        self.tamanho   = tamanho
+        self.chunk     = chunk
+        self.digest    = digest
+        self.manifesto = None
+        self.inicio    = 0
+        self.pos       = 0
+        self.arquivo   = None
+        self.mm        = None
+        self.view      = None
+
+    def abre(self):
+        """ Retorna o byte a partir do qual o arquivo deve vir """
+        if self.chunk:
+            self.manifesto = self.le_estado()
+        if self.manifesto is None:
+            # recomeça do zero: dados antigos não podem passar por bons
+            modo = 'w+b'
+        else:
+            modo = 'r+b' if os.path.exists(self.caminho) else 'w+b'
+        self.arquivo = open(self.caminho, modo)
+        self.arquivo.truncate(self.tamanho)
+        if self.tamanho > 0:
+            self.mm   = mmap.mmap(self.arquivo.fileno(), self.tamanho)
+            self.view = memoryview(self.mm)
+        if self.manifesto is not None:
+            bons = 0
+            while bons < len(self.manifesto.crcs) and self.manifesto.confere(self.view, bons):
+                bons += 1
+            self.inicio = min(self.tamanho, bons * self.chunk)
+        self.pos = self.inicio
+        return(self.inicio)
+
+    def precisa_manifesto(self):
+        return(self.chunk is not None and self.manifesto is None)
+
+    def le_estado(self):
+        try:
+            with open(self.estado, 'rb') as f:
+                dados = f.read()
+        except OSError:
+            return(None)
+        if len(dados) < IDENTIDADE.size:
+            return(None)
+        if IDENTIDADE.unpack_from(dados) != (self.tamanho, self.chunk, self.digest):
+            return(None)
+        manifesto = Manifesto.de_dados(self.tamanho, self.chunk, dados[IDENTIDADE.size:])
+        if manifesto.digest != self.digest:
+            return(None)
+        return(manifesto)
+
+    def recebe_manifesto(self, dados):
+        """ Guarda o manifesto; False se ele não é o anunciado no HELLO """
+        manifesto = Manifesto.de_dados(self.tamanho, self.chunk, dados)
+        if manifesto.digest != self.digest:
+            return(False)
+        with open(self.estado, 'wb') as f:
+            f.write(IDENTIDADE.pack(self.tamanho, self.chunk, self.digest))
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        self.manifesto = manifesto
+        return(True)
+
+    def escreve(self, data):
+        """ Grava data na posição atual; False se um bloco não confere """
+        if not data:
+            return(True)
+        fim = self.pos + len(data)
+        if fim > self.tamanho:
+            return(False)
+        self.view[self.pos:fim] = data
+        ok = True
+        if self.manifesto is not None:
+            # blocos que terminaram dentro deste trecho
+            for i in range(self.pos // self.chunk, fim // self.chunk):
+                ok = ok and self.manifesto.confere(self.view, i)
+        self.pos = fim
+        return(ok)
+
+    def conclui(self):
+        """ Confere o fim do arquivo e apaga o estado de retomada """
+        ok = self.pos == self.tamanho
+        if ok and self.manifesto is not None and self.tamanho % self.chunk:
+            ok = self.manifesto.confere(self.view, self.tamanho // self.chunk)
+        self.fecha()
+        if ok and os.path.exists(self.estado):
+            os.remove(self.estado)
+        return(ok)
+
+    def fecha(self):
+        if self.view is not None:
+            self.view.release()
+            self.mm.flush()
+            self.mm.close()
+            self.view = self.mm = None
+        if self.arquivo is not None:
+            self.arquivo.close()
+            self.arquivo = None
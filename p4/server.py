@@ -1,24 +1,54 @@
+import sys
 import time as t
-from pacote import Pacote
+from enlace import enlace
+from transferencia import Transferencia, TransferenciaAbortada
 
 
 class Server(object):
-    pass
+    def __init__(self, serialName, log='log_server.txt', retomadas=3):
+        self.sac = b'\xAF\xAF' # byte de sacrificio
+        self.com = enlace(serialName)
+        self.log = log
+        # tentativas ao todo; o que já foi gravado fica em ARQUIVO_SAIDA (+ .retomada)
+        self.retomadas = retomadas
+
+    def recebe(self, caminho):
+        self.com.enable()
+        try:
+            print('Esperando o byte de sacrifício...')
+            self.com.getData(len(self.sac))
+            t.sleep(0.05)
+            self.com.rx.clearBuffer()
+            print('Estabelecendo comunicação com o cliente...')
+            for tentativa in range(1, self.retomadas + 1):
+                # Transferencia nova a cada tentativa (buffer e extrator limpos)
+                transf = Transferencia(self.com, log=self.log)
+                try:
+                    return(transf.recv_file(caminho))
+                except TransferenciaAbortada as e:
+                    if tentativa == self.retomadas:
+                        raise
+                    print('Transferência interrompida ({}), esperando o cliente...'.format(e))
+                    self.com.rx.clearBuffer()
+                finally:
+                    transf.fecha()
+        finally:
+            self.com.disable()
 
 def main():
+    if len(sys.argv) < 3:
+        print('uso: python server.py PORTA ARQUIVO_SAIDA')
+        return
     # inicializacao de objetos
-    s = Server()
-    p = Pacote()
+    s = Server(sys.argv[1])
 
     # inicializacao
     print('#################################################')
     print('#####        Servidor inicializando         #####') 
     print('#################################################')
     t.sleep(1)
-    print('Estabelecendo comunicação com o cliente...')
-
-
-    print('Esperando o byte de sacrifício...')
+    tamanho = s.recebe(sys.argv[2])
+    print('Arquivo recebido: {} bytes.'.format(tamanho))
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Testes do enlace sem hardware (pares loopback)
+####################################################
+""" python -m pytest -q test_enlace.py  (ou python test_enlace.py) """
+
+import os
+import sys
+import asyncio
+import shutil
+import tempfile
+import functools
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import transporte
+import transferencia
+from enlace import enlace
+from enlaceAsync import AsyncEnlace
+from multiplexador import Multiplexador
+from transferencia import Transferencia
+from pacote import Pacote
+from metricas import EV_ENVIO, EV_REENVIO
+
+
+def par(modo='raw'):
+    a, b = transporte.parLoopback()
+    com1, com2 = enlace('A', modo, a), enlace('B', modo, b)
+    com1.enable()
+    com2.enable()
+    return(com1, com2)
+
+
+class TestTX(unittest.TestCase):
+
+    def test_envio_cancelado_nao_derruba_tx(self):
+        com1, com2 = par()
+        try:
+            com1.tx.threadPause()
+            cancelado = com1.sendData(b'abc')
+            self.assertTrue(cancelado.cancel())
+            com1.tx.threadResume()
+            self.assertEqual(com1.sendData(b'xyz').result(2), 3)
+            self.assertTrue(com1.tx.thread.is_alive())
+            self.assertEqual(com2.getData(3, 1), (b'xyz', 3))
+        finally:
+            com1.disable()
+            com2.disable()
+
+
+class TestAsync(unittest.TestCase):
+
+    def test_envio_cancelado_nao_trava_os_seguintes(self):
+        erros = []
+        async def main():
+            # erro num callback do loop (add_writer) só chega aqui
+            asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: erros.append(ctx))
+            ta, tb = transporte.parLoopback()
+            a, b = AsyncEnlace('A', 'raw', ta), AsyncEnlace('B', 'raw', tb)
+            await a.enable()
+            grande = os.urandom(1 << 20)
+            try:
+                # ninguém lê do outro lado: o pipe enche e o send estoura
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(a.send(grande), 0.05)
+                await b.enable()
+                recebe = asyncio.ensure_future(b.recv(len(grande) + 3))
+                self.assertEqual(await asyncio.wait_for(a.send(b'xyz'), 5), 3)
+                self.assertEqual(await asyncio.wait_for(recebe, 5), grande + b'xyz')
+            finally:
+                a.disable()
+                b.disable()
+            self.assertEqual(erros, [])
+        asyncio.run(main())
+
+
+class TestMultiplexador(unittest.TestCase):
+
+    def setUp(self):
+        self.mux = Multiplexador()
+        self.mux.threadStart()
+
+    def tearDown(self):
+        self.mux.threadKill()
+        self.mux.thread.join(2)
+        for porta in self.mux.portas:
+            porta.fisica.close()
+
+    def test_porta_quebrada_nao_derruba_as_outras(self):
+        ta, tb = transporte.parLoopback()
+        tb.close()  # escrever em ta agora dá BrokenPipeError
+        quebrada = self.mux.adiciona('Q', 'raw', ta)
+        tc, td = transporte.parLoopback()
+        a, b = self.mux.adiciona('A', 'raw', tc), self.mux.adiciona('B', 'raw', td)
+        with self.assertRaises(ConnectionError):
+            quebrada.sendData(b'abc').result(2)
+        with self.assertRaises(ConnectionError):
+            quebrada.sendData(b'abc').result(2)
+        pacote = Pacote().monta(6, 1, 1, b'xyz')
+        self.assertEqual(a.sendData(pacote).result(2), len(pacote))
+        pk = b.recv_packet(2)
+        self.assertTrue(pk.ok)
+        self.assertEqual(pk.payload, b'xyz')
+        self.assertTrue(self.mux.thread.is_alive())
+        self.assertNotIn(quebrada, self.mux.portas)
+
+    def test_remove_falha_envios_pendentes(self):
+        ta, tb = transporte.parLoopback()
+        porta = self.mux.adiciona('A', 'raw', ta)
+        # ninguém lê tb: o pipe enche e o envio fica pendente
+        pendente = porta.sendData(os.urandom(1 << 20))
+        self.mux.remove(porta)
+        with self.assertRaises(ConnectionError):
+            pendente.result(2)
+        tb.close()
+
+
+class TestTransferencia(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.origem = os.path.join(self.pasta, 'origem')
+        self.destino = os.path.join(self.pasta, 'destino')
+
+    def tearDown(self):
+        shutil.rmtree(self.pasta)
+
+    def transfere(self, dados, com1=None, com2=None, **opcoes):
+        """ Envia dados de com1 para com2; retorna (pacotes, Transferencia do cliente) """
+        if com1 is None:
+            com1, com2 = par()
+        with open(self.origem, 'wb') as f:
+            f.write(dados)
+        rx = Transferencia(com2, timeout=0.2)
+        tx = Transferencia(com1, timeout=0.2, **opcoes)
+        resultado = {}
+        def recebe():
+            resultado['tamanho'] = rx.recv_file(self.destino, timeout_hello=5)
+        thread = threading.Thread(target=recebe)
+        thread.start()
+        try:
+            total = tx.send_file(self.origem)
+        finally:
+            thread.join()
+            tx.fecha()
+            com1.disable()
+            com2.disable()
+        self.assertEqual(resultado.get('tamanho'), len(dados))
+        with open(self.destino, 'rb') as f:
+            self.assertEqual(f.read(), dados)
+        return(total, tx)
+
+    def test_log_dos_dados_tem_id_e_total(self):
+        log = os.path.join(self.pasta, 'log.txt')
+        total, _ = self.transfere(os.urandom(1000), log=log)
+        with open(log) as f:
+            dados = [l.split(' / ') for l in f if l.split(' / ')[2] == '6']
+        self.assertEqual([int(c[4]) for c in dados], list(range(1, total + 1)))
+        self.assertTrue(all(int(c[5]) == total for c in dados))
+
+    def test_rastro_dos_dados_tem_id_e_total(self):
+        com1, com2 = par()
+        rastro = com1.metricas.ativaRastro()
+        total, _ = self.transfere(os.urandom(1000), com1, com2)
+        dados = [e for e in rastro.eventos() if e[1] == EV_ENVIO and e[2] == 6]
+        self.assertEqual([e[3] for e in dados], list(range(1, total + 1)))
+        self.assertTrue(all(e[4] == total for e in dados))
+
+    def test_reenvio_comprimido_com_rastro(self):
+        com1, com2 = par()
+        rastro = com1.metricas.ativaRastro()
+        # perde a primeira cópia de cada pacote de dados de id par
+        envia, vistos = com1.sendData, set()
+        def perde(pacote):
+            id = bytes(pacote[1:3])
+            if pacote[0] == 6 and pacote[2] % 2 == 0 and id not in vistos:
+                vistos.add(id)
+                return(None)
+            return(envia(pacote))
+        com1.sendData = perde
+        # poucos pacotes prontos: o total só sai depois dos reenvios
+        compressor = functools.partial(transferencia.Compressor, maxProntos=4)
+        dados = bytes(range(256)) * 8 + os.urandom(3000)
+        with mock.patch.object(transferencia, 'Compressor', compressor):
+            _, tx = self.transfere(dados, com1, com2, compressao='zlib')
+        self.assertGreater(tx.reenvios, 0)
+        reenvios = [e for e in rastro.eventos() if e[1] == EV_REENVIO]
+        self.assertEqual(len(reenvios), tx.reenvios)
+
+
+if __name__ == '__main__':
+    unittest.main()
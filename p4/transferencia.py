@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Transferência confiável de arquivos sobre o enlace
+####################################################
+""" Janela deslizante com repetição seletiva
+
+Protocolo (tipos do Pacote):
+    HELLO  cliente -> server, total de pacotes no header,
+           tamanho do arquivo, janela, codec oferecido e
+           identidade do manifesto no payload; resposta ACK 0
+           com o codec aceito e o byte onde começar
+    DADOS  pacotes 1..total, até `janela` em voo; os
+           primeiros trazem o manifesto se o server pediu
+    ACK n  pacote n gravado (ACK 0 também retoma após PAUSE)
+    ERRO n CRC do pacote n não confere, reenviar já
+    PAUSE  server pede para o cliente parar de enviar
+    ABORT  qualquer lado desiste da transferência
+    FIN    cliente encerra com o total de pacotes; server responde FIN
+
+Os ids de dados continuam depois de 65535: no header vai
+id_linha(id), que volta a 1, e cada lado desdobra o id
+recebido a partir da base da sua janela.
+
+Cada pacote em voo tem seu próprio timer e só ele é
+reenviado quando estoura. Os pacotes de dados são
+montados sob demanda a partir de um mmap do arquivo,
+inclusive nos reenvios.
+
+Com compressao='zlib' ou 'lzma' o cliente oferece
+compressão no HELLO; se o server aceitar, os payloads
+vêm de um compressao.Compressor e o total de pacotes
+só é conhecido no FIN (ver compressao.py).
+
+O destino é gravado num mmap pré-alocado e cada bloco
+de 64 KiB é conferido contra o manifesto do cliente;
+uma transferência interrompida continua do último bloco
+bom na próxima chamada (ver retomada.py).
+
+Não há compatibilidade com versões anteriores do
+protocolo: o HELLO e o ACK 0 têm formato fixo e o CRC
+cobre o header, então os dois lados precisam rodar a
+mesma versão.
+"""
+
+# Importa pacote de tempo
+import time
+
+import os
+import mmap
+import struct
+
+from pacote import Pacote
+from compressao import CODECS, SEM_COMPRESSAO, Compressor, Descompressor
+from retomada import CHUNK, FLAG_MANIFESTO, Manifesto, ArquivoSaida
+from quadro import ExtratorQuadros
+from metricas import Metricas, EV_ENVIO, EV_RECEB, EV_ERRO_CRC, EV_REENVIO
+
+
+class TransferenciaAbortada(Exception):
+    pass
+
+
+def id_linha(id):
+    """ Id de dados no header: 1..65535, nunca 0 (ACK 0 é do HELLO) """
+    return((id - 1) % 0xFFFF + 1)
+
+
+def desdobra(idLinha, base):
+    """ Id completo de um id do header, contado a partir de base """
+    return(base + (idLinha - id_linha(base)) % 0xFFFF)
+
+
+class Transferencia(object):
+
+    def __init__(self, com, janela=8, timeout=0.5, tentativas=10, pacote=None, log=None,
+                 compressao=None):
+        if janela >= 0x7FFF:
+            raise ValueError('janela maior que metade do espaço de ids')
+        self.com        = com
+        self.p          = pacote if pacote is not None else Pacote()
+        self.janela     = janela
+        self.timeout    = timeout
+        self.tentativas = tentativas
+        self.buffer     = b""
+        self.extrator   = ExtratorQuadros(self.p.EOP)
+        self.log        = open(log, 'a') if log else None
+        self.erros      = 0
+        self.reenvios   = 0
+        # codec oferecido no HELLO (envio); o server aceita qualquer um de CODECS
+        self.codec      = CODECS[compressao] if compressao else SEM_COMPRESSAO
+        self.compressor = None
+        self.chunk      = CHUNK
+        # envio: manifesto, pacotes que o levam e byte onde o server quer começar
+        self.manifesto  = None
+        self.nManifesto = 0
+        self.inicio     = 0
+        # usa as métricas do enlace, se ele tiver
+        self.metricas   = getattr(com, 'metricas', None) or Metricas()
+
+    def fecha(self):
+        if self.log:
+            self.log.close()
+            self.log = None
+
+    ####################
+    # envio e recepção #
+    ####################
+
+    def registra(self, sentido, tipo, tamanho, id=None, total=None, crc=None):
+        """ Uma linha por pacote, no formato pedido no enunciado do p4 """
+        if not self.log:
+            return
+        agora = time.time()
+        linha = '{}.{:03d} / {} / {} / {}'.format(
+            time.strftime('%d/%m/%Y %H:%M:%S', time.localtime(agora)),
+            int(agora * 1000) % 1000, sentido, tipo, tamanho)
+        if tipo == self.p.DADOS:
+            linha += ' / {} / {} / {:04X}'.format(id, total, crc)
+        self.log.write(linha + '\n')
+
+    def envia(self, tipo, id=0, total=0, payload=b'', pacote=None):
+        if pacote is None:
+            pacote = self.p.monta(tipo, id, total, payload)
+        self.com.sendData(pacote)
+        # pacotes já montados (DADOS) chegam sem id/total: vêm do header
+        _, id, total, _, crc, _ = self.p.header_de(pacote)
+        self.metricas.quadro(EV_ENVIO, tipo, id, total, len(pacote))
+        if self.log:
+            self.registra('envio', tipo, len(pacote), id, total, crc)
+
+    def recebe(self, timeout):
+        """ Espera até timeout por dados e retorna os pacotes completos """
+        data, nRx = self.com.getData(1, timeout)
+        if nRx == 0:
+            return([])
+        resto = self.com.rx.getBufferLen()
+        if resto > 0:
+            data += self.com.getData(resto)[0]
+        if self.p.stuffing:
+            pacotes = []
+            for quadro in self.extrator.alimenta(data):
+                pk = self.p.le_quadro(quadro)
+                if pk is None:
+                    self.erros += 1
+                    self.metricas.erroDecode()
+                else:
+                    pacotes.append(pk._replace(payload=bytes(pk.payload)))
+        else:
+            self.buffer += data
+            pacotes, consumido, erros = self.p.desempacotar(self.buffer)
+            pacotes = [pk._replace(payload=bytes(pk.payload)) for pk in pacotes]
+            self.buffer = self.buffer[consumido:]
+            self.erros += erros
+            for _ in range(erros):
+                self.metricas.erroDecode()
+        for pk in pacotes:
+            self.metricas.quadro(EV_RECEB if pk.ok else EV_ERRO_CRC, pk.tipo, pk.id,
+                                 pk.total, len(pk.payload))
+            self.registra('receb', pk.tipo, len(pk.payload) + self.p.hdr_len + len(self.p.EOP),
+                          pk.id, pk.total, pk.crc)
+        return(pacotes)
+
+    def espera(self, tipos, timeout):
+        """ Primeiro pacote válido de um dos tipos, ou None """
+        limite = time.monotonic() + timeout
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return(None)
+            for pk in self.recebe(restante):
+                if pk.tipo == self.p.ABORT:
+                    raise TransferenciaAbortada('abortado pelo outro lado')
+                if pk.ok and pk.tipo in tipos:
+                    return(pk)
+
+    def aborta(self):
+        self.envia(self.p.ABORT)
+        raise TransferenciaAbortada('sem resposta depois de {} tentativas'.format(self.tentativas))
+
+    #########
+    # envio #
+    #########
+
+    def handshake(self, total, tamanho):
+        """ Retorna (codec aceito, byte inicial, manda o manifesto?) """
+        hello = struct.pack('>QHBII', tamanho, self.janela, self.codec,
+                            self.chunk, self.manifesto.digest)
+        for _ in range(self.tentativas):
+            self.envia(self.p.HELLO, 0, min(total, 0xFFFF), hello)
+            pk = self.espera((self.p.ACK,), self.timeout)
+            if pk is not None and pk.id == 0 and len(pk.payload) >= 10:
+                return(struct.unpack_from('>BQB', pk.payload))
+        self.aborta()
+
+    def send_file(self, caminho):
+        """ Envia o arquivo e retorna o número de pacotes """
+        with open(caminho, 'rb') as f:
+            tamanho = os.fstat(f.fileno()).st_size
+            if tamanho == 0:
+                return(self.envia_pacotes(None, 0))
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return(self.envia_pacotes(view, tamanho))
+
+    def envia_pacotes(self, view, tamanho):
+        if view is None:
+            view = memoryview(b"")
+        P = self.p.tamanho_payload
+        self.manifesto  = Manifesto.de_view(view, self.chunk)
+        self.compressor = None
+        codec, self.inicio, manda = self.handshake(self.p.total_pacotes(tamanho), tamanho)
+        self.nManifesto = -(-len(self.manifesto.dados) // P) if manda else 0
+        total = self.nManifesto + -(-(tamanho - self.inicio) // P)
+        with view[self.inicio:] as resto:
+            if codec != SEM_COMPRESSAO:
+                self.compressor = Compressor(resto, codec, P)
+                self.compressor.threadStart()
+                total = None
+            try:
+                return(self.janela_deslizante(resto, total))
+            finally:
+                if self.compressor is not None:
+                    self.compressor.threadKill()
+
+    def janela_deslizante(self, view, total):
+        """ Envia view (o arquivo a partir de self.inicio)
+
+        total é None enquanto o Compressor não terminar.
+        """
+        gerados     = total
+        base        = 1
+        proximo     = 1
+        timers      = {}   # id em voo -> instante do último envio
+        tentativas  = {}
+        confirmados = set()
+        pausado     = False
+        while total is None or base <= total:
+            if self.compressor is not None:
+                # sem nada em voo não há ACK a esperar, só o compressor
+                gerados = self.nManifesto + self.compressor.disponiveis(
+                    0 if timers or pausado or proximo <= self.nManifesto else self.timeout)
+                if self.compressor.total is not None:
+                    total = self.nManifesto + self.compressor.total
+            agora = time.monotonic()
+            if not pausado:
+                while proximo < base + self.janela and proximo <= gerados:
+                    self.envia(self.p.DADOS, pacote=self.pacote_dados(view, proximo, total))
+                    timers[proximo]     = agora
+                    tentativas[proximo] = 1
+                    proximo += 1
+                # só os pacotes cujo timer estourou são reenviados
+                for id, instante in list(timers.items()):
+                    if agora - instante >= self.timeout:
+                        self.reenvia(view, id, total, timers, tentativas)
+            if not timers and not pausado:
+                continue
+
+            prazo = self.timeout
+            if timers and not pausado:
+                prazo = max(0.001, min(timers.values()) + self.timeout - time.monotonic())
+            for pk in self.recebe(prazo):
+                if pk.tipo == self.p.ABORT:
+                    raise TransferenciaAbortada('abortado pelo server')
+                if not pk.ok:
+                    continue
+                if pk.tipo == self.p.PAUSE:
+                    pausado = True
+                elif pk.tipo == self.p.ACK:
+                    if pausado:
+                        # retoma com timers novos
+                        pausado = False
+                        agora = time.monotonic()
+                        timers = dict.fromkeys(timers, agora)
+                    id = desdobra(pk.id, base)
+                    if id in timers:
+                        del timers[id]
+                        confirmados.add(id)
+                elif pk.tipo == self.p.ERRO and desdobra(pk.id, base) in timers:
+                    self.reenvia(view, desdobra(pk.id, base), total, timers, tentativas)
+            while base in confirmados:
+                confirmados.discard(base)
+                base += 1
+            if self.compressor is not None:
+                self.compressor.libera(base - self.nManifesto)
+
+        for _ in range(self.tentativas):
+            self.envia(self.p.FIN, 0, total & 0xFFFF, struct.pack('>Q', total))
+            if self.espera((self.p.FIN,), self.timeout) is not None:
+                return(total)
+        self.aborta()
+
+    def reenvia(self, view, id, total, timers, tentativas):
+        if tentativas[id] >= self.tentativas:
+            self.aborta()
+        tentativas[id] += 1
+        self.reenvios  += 1
+        # com compressão total é None até o Compressor terminar
+        self.metricas.quadro(EV_REENVIO, self.p.DADOS, id, total or 0, 0)
+        self.envia(self.p.DADOS, pacote=self.pacote_dados(view, id, total))
+        timers[id] = time.monotonic()
+
+    def pacote_dados(self, view, id, total):
+        """ Pacote id: manifesto, depois o arquivo (comprimido ou não) """
+        P = self.p.tamanho_payload
+        total = (total or 0) & 0xFFFF
+        if id <= self.nManifesto:
+            return(self.p.monta(self.p.DADOS, id_linha(id), total,
+                                self.manifesto.dados[(id - 1) * P:id * P], FLAG_MANIFESTO))
+        i = id - self.nManifesto
+        if self.compressor is not None:
+            payload, flags = self.compressor.payload(i)
+            return(self.p.monta(self.p.DADOS, id_linha(id), total, payload, flags))
+        with view[(i - 1) * P:i * P] as payload:
+            return(self.p.monta(self.p.DADOS, id_linha(id), total, payload))
+
+    ############
+    # recepção #
+    ############
+
+    def pausa(self):
+        """ Pede ao cliente para parar de enviar (ex.: disco ocupado) """
+        self.envia(self.p.PAUSE)
+
+    def retoma(self):
+        self.envia(self.p.ACK, 0)
+
+    def recv_file(self, caminho, timeout_hello=None):
+        """ Recebe um arquivo e grava em caminho
+
+        Espera o HELLO por até timeout_hello segundos
+        (None = para sempre). Retorna o número de bytes.
+        Se caminho.retomada existe e é do mesmo arquivo,
+        só os blocos que faltam são pedidos.
+        """
+        limite = None if timeout_hello is None else time.monotonic() + timeout_hello
+        hello = None
+        while hello is None:
+            if limite is not None and time.monotonic() >= limite:
+                raise TransferenciaAbortada('nenhum HELLO recebido')
+            hello = self.espera((self.p.HELLO,), self.timeout)
+            if hello is not None and len(hello.payload) < 19:
+                hello = None  # HELLO de outra versão do protocolo
+        tamanho, janela, codec, chunk, digest = struct.unpack_from('>QHBII', hello.payload)
+        if codec not in CODECS.values():
+            codec = SEM_COMPRESSAO
+        saida = ArquivoSaida(caminho, tamanho, chunk, digest)
+        try:
+            inicio = saida.abre()
+            manifesto = b"" if saida.precisa_manifesto() else None
+            aceite = struct.pack('>BQB', codec, inicio, manifesto is not None)
+            self.envia(self.p.ACK, 0, payload=aceite)
+            return(self.recebe_dados(saida, janela, codec, aceite, manifesto))
+        finally:
+            saida.fecha()
+
+    def recebe_dados(self, saida, janela, codec, aceite, manifesto):
+        descompressor = Descompressor(codec)
+        base       = 1
+        fora_ordem = {}   # pacotes da janela que chegaram antes da vez
+        silencio   = 0
+        while True:
+            pacotes = self.recebe(self.timeout)
+            if not pacotes:
+                silencio += 1
+                if silencio > self.tentativas:
+                    raise TransferenciaAbortada('cliente parou de responder')
+                continue
+            silencio = 0
+            for pk in pacotes:
+                if pk.tipo == self.p.ABORT:
+                    raise TransferenciaAbortada('abortado pelo cliente')
+                if pk.tipo == self.p.HELLO and pk.ok:
+                    self.envia(self.p.ACK, 0, payload=aceite)  # nosso ACK se perdeu
+                elif pk.tipo == self.p.FIN and pk.ok and base > self.total_fin(pk):
+                    if not saida.conclui():
+                        self.envia(self.p.ABORT)
+                        raise TransferenciaAbortada('arquivo recebido não confere')
+                    self.envia(self.p.FIN, pk.id, pk.total, pk.payload)
+                    self.encerra()
+                    return(saida.tamanho)
+                elif pk.tipo == self.p.DADOS:
+                    if not pk.ok:
+                        self.envia(self.p.ERRO, pk.id)
+                    elif desdobra(pk.id, base) < base + janela:
+                        fora_ordem[desdobra(pk.id, base)] = pk
+                        self.envia(self.p.ACK, pk.id)
+                    else:
+                        self.envia(self.p.ACK, pk.id)  # duplicado, ACK perdido
+            while base in fora_ordem:
+                pk = fora_ordem.pop(base)
+                base += 1
+                if pk.flags & FLAG_MANIFESTO and manifesto is not None:
+                    manifesto += pk.payload
+                    esperado = Manifesto.tamanho_dados(saida.tamanho, saida.chunk)
+                    ok = len(manifesto) < esperado or saida.recebe_manifesto(manifesto)
+                else:
+                    ok = saida.escreve(descompressor.alimenta(pk.payload, pk.flags))
+                if not ok:
+                    # na próxima tentativa a retomada começa do bloco ruim
+                    self.envia(self.p.ABORT)
+                    raise TransferenciaAbortada('bloco do arquivo não confere com o manifesto')
+
+    def encerra(self):
+        # fica um tempo respondendo FINs repetidos (nosso FIN pode se perder)
+        limite = time.monotonic() + 2 * self.timeout
+        while time.monotonic() < limite:
+            for pk in self.recebe(limite - time.monotonic()):
+                if pk.ok and pk.tipo == self.p.FIN:
+                    self.envia(self.p.FIN, pk.id, pk.total, pk.payload)
+
+    @staticmethod
+    def total_fin(pk):
+        """ Total de pacotes do FIN (o header só tem 16 bits) """
+        if len(pk.payload) >= 8:
+            return(struct.unpack_from('>Q', pk.payload)[0])
+        return(pk.total)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#####################################################
+# Camada Física da Computação
+#  Transportes para a interface física
+####################################################
+""" Backends que a fisica pode usar no lugar da serial
+
+O backend padrão continua sendo o serial.Serial aberto
+pela própria fisica. Os daqui oferecem a mesma
+superfície que ela usa: read(n), write(data),
+flush(), in_waiting, reset_input_buffer(),
+reset_output_buffer(), close() e fileno().
+
+    a, b = parLoopback()
+    com1 = enlace('A', transporte=a)
+    com2 = enlace('B', transporte=b)
+
+Assim o p4 inteiro (enlace, RX, TX, client/server)
+roda sem hardware. TransporteLimitado simula a taxa
+e a latência de um link real.
+Usa pipes, pty e termios: só funciona em POSIX.
+"""
+
+# Importa pacote de tempo
+import time
+
+# Threads
+import threading
+
+# Fila de entrega do transporte limitado
+import collections
+
+import os
+import fcntl
+import select
+import socket
+import struct
+import termios
+import tty
+
+
+class TransporteFd(object):
+    """ Transporte sobre descritores de arquivo (pipe, pty, socket)
+
+    read(n) bloqueia até chegar ao menos 1 byte ou até o
+    timeout e retorna o que houver (até n bytes).
+    """
+
+    def __init__(self, fdLeitura, fdEscrita, timeout=0.1, nome=None):
+        self.fdLeitura = fdLeitura
+        self.fdEscrita = fdEscrita
+        self.timeout   = timeout
+        self.nome      = nome
+        self.is_open   = True
+
+    @property
+    def in_waiting(self):
+        buf = fcntl.ioctl(self.fdLeitura, termios.FIONREAD, b"\0\0\0\0")
+        return(struct.unpack("i", buf)[0])
+
+    def fileno(self):
+        return(self.fdLeitura)
+
+    def read(self, nBytes):
+        if nBytes <= 0 or not self.is_open:
+            return(b"")
+        pronto, _, _ = select.select([self.fdLeitura], [], [], self.timeout)
+        if not pronto:
+            return(b"")
+        try:
+            return(os.read(self.fdLeitura, nBytes))
+        except OSError:
+            # pty sem o outro lado aberto (EIO)
+            return(b"")
+
+    def write(self, data):
+        view = memoryview(data)
+        while len(view) > 0:
+            n = os.write(self.fdEscrita, view)
+            view = view[n:]
+        return(len(data))
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        while self.in_waiting > 0:
+            os.read(self.fdLeitura, self.in_waiting)
+
+    def reset_output_buffer(self):
+        pass
+
+    def close(self):
+        if not self.is_open:
+            return
+        self.is_open = False
+        os.close(self.fdLeitura)
+        if self.fdEscrita != self.fdLeitura:
+            os.close(self.fdEscrita)
+
+
+def parLoopback(timeout=0.1):
+    """ Par de transportes no mesmo processo ligados por dois pipes """
+    rA, wB = os.pipe()
+    rB, wA = os.pipe()
+    return(TransporteFd(rA, wA, timeout, 'loopA'),
+           TransporteFd(rB, wB, timeout, 'loopB'))
+
+
+def parPty(timeout=0.1):
+    """ Par pty do Linux em modo raw
+
+    O lado escravo também pode ser aberto pela serial
+    (pyserial) pelo nome em transporte.nome.
+    """
+    mestre, escravo = os.openpty()
+    tty.setraw(mestre)
+    tty.setraw(escravo)
+    nome = os.ttyname(escravo)
+    return(TransporteFd(mestre, mestre, timeout, 'ptmx'),
+           TransporteFd(escravo, escravo, timeout, nome))
+
+
+def parSocket(timeout=0.1):
+    """ Par de sockets unix conectados """
+    a, b = socket.socketpair()
+    fdA, fdB = a.detach(), b.detach()
+    return(TransporteFd(fdA, fdA, timeout, 'sockA'),
+           TransporteFd(fdB, fdB, timeout, 'sockB'))
+
+
+class TransporteLimitado(object):
+    """ Envolve outro transporte limitando a taxa e somando latência
+
+    Cada byte ocupa bitsPorByte/baudrate segundos na
+    linha (8N1 = 10 bits) e é entregue ao transporte
+    interno latencia segundos depois de sair da linha.
+    write bloqueia enquanto a linha estiver ocupada por
+    mais de bufferTx bytes, como a UART real.
+    """
+
+    def __init__(self, interno, baudrate=115200, latencia=0.0, bitsPorByte=10, bufferTx=64):
+        self.interno     = interno
+        self.baudrate    = baudrate
+        self.latencia    = latencia
+        self.bitsPorByte = bitsPorByte
+        self.bufferTx    = bufferTx
+        self.linhaLivre  = time.monotonic()
+        self.entregas    = collections.deque()
+        self.cond        = threading.Condition()
+        self.threadStop  = False
+        self.thread      = threading.Thread(target=self.entrega, args=(), daemon=True)
+        self.thread.start()
+
+    @property
+    def in_waiting(self):
+        return(self.interno.in_waiting)
+
+    @property
+    def timeout(self):
+        return(self.interno.timeout)
+
+    def fileno(self):
+        return(self.interno.fileno())
+
+    def read(self, nBytes):
+        return(self.interno.read(nBytes))
+
+    def write(self, data):
+        data    = bytes(data)
+        porByte = self.bitsPorByte / self.baudrate
+        with self.cond:
+            espera = self.linhaLivre - time.monotonic() - self.bufferTx * porByte
+        if espera > 0:
+            # buffer de saída cheio: segura quem escreve
+            time.sleep(espera)
+        with self.cond:
+            # entrega em pedaços, como a UART que vai soltando os bytes
+            inicio = max(time.monotonic(), self.linhaLivre)
+            for i in range(0, len(data), self.bufferTx):
+                pedaco = data[i:i + self.bufferTx]
+                inicio += len(pedaco) * porByte
+                self.entregas.append((inicio + self.latencia, pedaco))
+            self.linhaLivre = inicio
+            self.cond.notify()
+        return(len(data))
+
+    def entrega(self):
+        while True:
+            with self.cond:
+                while not self.entregas and not self.threadStop:
+                    self.cond.wait()
+                if self.threadStop:
+                    return
+                instante, data = self.entregas[0]
+                atraso = instante - time.monotonic()
+                if atraso > 0:
+                    self.cond.wait(atraso)
+                    continue
+                self.entregas.popleft()
+            self.interno.write(data)
+
+    def flush(self):
+        # como na serial, flush espera os dados saírem da linha
+        espera = self.linhaLivre - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+
+    def reset_input_buffer(self):
+        self.interno.reset_input_buffer()
+
+    def reset_output_buffer(self):
+        with self.cond:
+            self.entregas.clear()
+
+    def close(self):
+        with self.cond:
+            self.threadStop = True
+            self.cond.notify_all()
+        self.interno.close()
+
+
+def descritores(port):
+    """ (fdLeitura, fdEscrita) para fazer o I/O direto no descritor
+
+    Usado por quem espera a porta com select ou asyncio
+    (multiplexador, enlaceAsync). O TransporteLimitado
+    não serve: a taxa e a latência estão na thread dele,
+    e não no descritor.
+    """
+    if isinstance(port, TransporteFd):
+        return(port.fdLeitura, port.fdEscrita)
+    if isinstance(port, TransporteLimitado) or not hasattr(port, 'fileno'):
+        raise ValueError('transporte {} não escreve direto num descritor; '
+                         'use serial, pty, pipe ou socket'.format(type(port).__name__))
+    # serial.Serial: o mesmo descritor para ler e escrever
+    fd = port.fileno()
+    return(fd, fd)
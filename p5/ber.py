@@ -0,0 +1,131 @@
+# ber.py
+"""
+Taxa de erro de bit (BER) da UART do p5 por Monte-Carlo.
+
+Para cada combinação de baud e skew gera bytes aleatórios, sintetiza a
+forma de onda do transmissor.ino (uart.gera, com jitter e ruído),
+decodifica com uart.decodifica e conta os bits de dados errados. Quadros
+que o receptor perdeu contam como 8 bits errados. As combinações são
+divididas em lotes e rodam em todos os núcleos (ProcessPoolExecutor).
+
+    python ber.py --baud 9600 19200 38400 57600 115200 --skew -0.04 -0.02 0 0.02 0.04
+    python ber.py --modo arduino --stop 1 --saida ber.json
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from uart import gera, decodifica, ERRO_PARIDADE, ERRO_STOP
+
+# POPCOUNT[b] = número de bits 1 de b
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def compara(enviados, inicios, q, tolerancia):
+    """
+    Casa cada quadro enviado com o decodificado que começou a menos de
+    tolerancia amostras dele. Retorna (bits errados, quadros perdidos,
+    quadros com erro detectado por paridade/stop).
+    """
+    if len(q.inicios) == 0:
+        return 8 * len(enviados), len(enviados), 0
+    j = np.clip(np.searchsorted(q.inicios, inicios), 1, len(q.inicios) - 1)
+    # decodificado mais próximo de cada start enviado
+    antes = q.inicios[j - 1]
+    depois = q.inicios[j]
+    j = np.where(np.abs(inicios - antes) <= np.abs(depois - inicios), j - 1, j)
+    if len(q.inicios) == 1:
+        j = np.zeros(len(inicios), np.int64)
+    casou = np.abs(q.inicios[j] - inicios) <= tolerancia
+    recebidos = np.frombuffer(q.dados, np.uint8)[j]
+    errados = POPCOUNT[recebidos[casou] ^ enviados[casou]].sum()
+    perdidos = np.count_nonzero(~casou)
+    detectados = np.count_nonzero(q.erros[j[casou]] & (ERRO_PARIDADE | ERRO_STOP))
+    return int(errados) + 8 * int(perdidos), int(perdidos), int(detectados)
+
+
+def lote(args):
+    """Um lote de quadros de uma combinação (roda num processo do pool)."""
+    baud, skew, n, fs, stop, jitter, ruido, modo, semente = args
+    rng = np.random.default_rng(semente)
+    enviados = rng.integers(0, 256, n, dtype=np.uint8)
+    x, inicios = gera(enviados.tobytes(), fs, baud, stop, skew, jitter, ruido, rng=rng)
+    q = decodifica(x, fs, baud, modo=modo)
+    errados, perdidos, detectados = compara(enviados, inicios, q, fs / baud / 2)
+    return baud, skew, n, errados, perdidos, detectados
+
+
+def varre(bauds, skews, quadros=20000, lote_max=5000, fs=1e6, stop=4, jitter=0.0,
+          ruido=0.0, modo='maioria', semente=0, processos=None):
+    """Dicionário (baud, skew) -> resultado; as sementes vêm de um único SeedSequence."""
+    tarefas = []
+    for baud in bauds:
+        for skew in skews:
+            for inicio in range(0, quadros, lote_max):
+                tarefas.append([baud, skew, min(lote_max, quadros - inicio), fs, stop,
+                                jitter, ruido, modo])
+    sementes = np.random.SeedSequence(semente).spawn(len(tarefas))
+    tarefas = [t + [s] for t, s in zip(tarefas, sementes)]
+
+    resultados = {}
+    with ProcessPoolExecutor(processos) as pool:
+        for baud, skew, n, errados, perdidos, detectados in pool.map(lote, tarefas):
+            r = resultados.setdefault((baud, skew), {'quadros': 0, 'bits_errados': 0,
+                                                     'perdidos': 0, 'detectados': 0})
+            r['quadros'] += n
+            r['bits_errados'] += errados
+            r['perdidos'] += perdidos
+            r['detectados'] += detectados
+    for r in resultados.values():
+        r['ber'] = r['bits_errados'] / (8 * r['quadros'])
+    return resultados
+
+
+def tabela(resultados, bauds, skews):
+    linhas = ['{:>8} '.format('baud') + ''.join('{:>11}'.format('{:+.1%}'.format(s)) for s in skews)]
+    for baud in bauds:
+        linhas.append('{:>8} '.format(baud) + ''.join(
+            '{:>11.2e}'.format(resultados[(baud, s)]['ber']) for s in skews))
+    return '\n'.join(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BER da UART do p5 por Monte-Carlo')
+    parser.add_argument('--baud', type=int, nargs='+', default=[9600, 19200, 38400, 57600, 115200])
+    parser.add_argument('--skew', type=float, nargs='+', default=[-0.06, -0.04, -0.02, 0.0, 0.02, 0.04, 0.06])
+    parser.add_argument('--quadros', type=int, default=20000, help='quadros por combinação')
+    parser.add_argument('--fs', type=float, default=1e6, help='taxa de amostragem simulada')
+    parser.add_argument('--stop', type=int, default=4, help='períodos de stop do transmissor')
+    parser.add_argument('--jitter', type=float, default=0.0, help='desvio das bordas (fração de bit)')
+    parser.add_argument('--ruido', type=float, default=0.0, help='desvio do ruído (nível 0..1)')
+    parser.add_argument('--modo', default='maioria', choices=['maioria', 'arduino'])
+    parser.add_argument('--processos', type=int, default=None)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--saida', help='grava os resultados em JSON')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    resultados = varre(args.baud, args.skew, args.quadros, fs=args.fs, stop=args.stop,
+                       jitter=args.jitter, ruido=args.ruido, modo=args.modo,
+                       semente=args.semente, processos=args.processos)
+    duracao = time.perf_counter() - inicio
+
+    print(f"BER (modo {args.modo}, stop {args.stop}, jitter {args.jitter}, ruido {args.ruido}, "
+          f"{args.quadros} quadros por ponto)")
+    print(tabela(resultados, args.baud, args.skew))
+    print(f"\n{len(resultados) * args.quadros} quadros em {duracao:.1f} s "
+          f"({args.processos or os.cpu_count()} processos)")
+
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            json.dump({'parametros': vars(args),
+                       'resultados': [dict(baud=b, skew=s, **r) for (b, s), r in resultados.items()]},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
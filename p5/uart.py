@@ -0,0 +1,237 @@
+# uart.py
+"""
+Decodificador offline da UART por software do p5.
+
+Quadro (igual ao transmissor.ino / receptor.ino), linha em repouso em 1:
+    start (0) | 8 bits de dados, LSB primeiro | paridade par | stop (1)
+
+decodifica() recebe a captura inteira (analisador lógico ou osciloscópio)
+como array do NumPy e faz tudo em bloco: acha as bordas de descida,
+amostra todos os bits de todos os quadros de uma vez por voto de maioria
+e confere paridade e stop. Com modo='arduino' a amostragem imita o
+receptor.ino (uma leitura por bit, bitPeriod inteiro em µs), para testar
+a tolerância de tempo do código do Arduino sem o Arduino.
+
+gera() faz o caminho inverso (bytes -> forma de onda do transmissor.ino),
+com erro de relógio, jitter e ruído; ber.py usa os dois para medir a taxa
+de erro de bit em função do baud e do skew.
+
+    python uart.py captura.npy 1000000          # fs em Hz
+    python uart.py captura.csv 1000000 --baud 9600
+"""
+import bisect
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+BAUD = 19200
+BITS_QUADRO = 11           # start + 8 dados + paridade + stop
+
+ERRO_PARIDADE = 0x01
+ERRO_STOP     = 0x02       # stop bit em 0 (erro de enquadramento)
+
+# PARIDADE[b] = número de bits 1 de b, módulo 2 (calculaParidade do .ino)
+PARIDADE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8) & 1
+
+# dados: bytes decodificados; erros: flags ERRO_* por quadro;
+# inicios: amostra da borda de descida de cada start bit
+Quadros = namedtuple('Quadros', ['dados', 'erros', 'inicios'])
+
+
+def binariza(x, limiar=None):
+    """Captura analógica -> nível lógico. Sem limiar usa o meio entre os percentis 5 e 95."""
+    x = np.asarray(x)
+    if x.dtype == bool:
+        return x
+    if limiar is None:
+        baixo, alto = np.percentile(x, [5, 95])
+        limiar = (baixo + alto) / 2
+    return x > limiar
+
+
+def bordas_descida(b):
+    """Índices onde a linha passa de 1 para 0."""
+    return np.flatnonzero(b[:-1] & ~b[1:]) + 1
+
+
+def soma_janelas(acumulado, inicio, largura):
+    """Quantos 1 há em b[inicio:inicio+largura] para cada inicio (acumulado = cumsum com 0 na frente)."""
+    fim = np.clip(inicio + largura, 0, len(acumulado) - 1)
+    inicio = np.clip(inicio, 0, len(acumulado) - 1)
+    return acumulado[fim] - acumulado[inicio]
+
+
+def filtra(acumulado, largura):
+    """Maioria móvel de largura amostras: tira os glitches antes de procurar bordas."""
+    b = np.diff(acumulado).astype(bool)
+    if largura <= 1:
+        return b
+    janelas = acumulado[largura:] - acumulado[:-largura]   # soma de b[j:j+largura]
+    meio = largura // 2
+    b[meio:meio + len(janelas)] = 2 * janelas > largura
+    return b
+
+
+def encadeia(nivel, bordas, valido, retoma, ultimo):
+    """
+    Escolhe os starts como a UART: depois de um quadro ela só volta a olhar
+    a linha retoma amostras depois do start. Se a linha já está em 0 nesse
+    instante o quadro seguinte começa ali mesmo (é o que o while do
+    receptor.ino faz); senão começa na próxima borda de descida.
+    O laço anda de quadro em quadro; as bordas já vêm filtradas.
+    """
+    inicios = []
+    n = len(nivel)
+    j = 0
+    pos = None
+    bordas = bordas.tolist()
+    while True:
+        if pos is not None and pos < n and not nivel[pos] and valido(pos):
+            s = pos
+        else:
+            j = bisect.bisect_left(bordas, pos or 0, j)
+            if j == len(bordas):
+                break
+            s = bordas[j]
+        if s + ultimo > n:
+            break
+        inicios.append(s)
+        pos = s + retoma
+    return np.asarray(inicios, dtype=np.int64)
+
+
+def decodifica(x, fs, baud=BAUD, limiar=None, modo='maioria', fracao=0.5, filtro=0.125):
+    """
+    Decodifica todos os quadros de uma captura.
+
+    x       amostras (bool, 0/1 ou analógicas)
+    fs      taxa de amostragem (Hz)
+    baud    taxa nominal da linha
+    modo    'maioria': cada bit é o voto da janela central (fracao do bit);
+            'arduino': uma amostra por bit, como o receptor.ino
+            (bitPeriod = 1000000 // baud µs, primeira leitura a 1,5 bit)
+    filtro  largura (em bits) da maioria móvel usada só para achar os starts
+
+    Retorna Quadros(dados, erros, inicios).
+    """
+    b = binariza(x, limiar)
+    k = np.arange(BITS_QUADRO)
+    if modo == 'arduino':
+        # delayMicroseconds(bitPeriod + bitPeriod/2) e depois um bitPeriod por
+        # leitura; depois do stop ainda espera um bitPeriod antes de voltar
+        us = 1000000 // baud
+        largura = 1
+        centros = np.round((k * us + us // 2) * 1e-6 * fs).astype(np.int64)
+        retoma = int(np.ceil((BITS_QUADRO * us + us // 2) * 1e-6 * fs))
+    else:
+        periodo = fs / baud
+        largura = max(1, int(round(periodo * fracao)))
+        # a janela de cada bit começa largura/2 antes do centro
+        centros = np.round((k + 0.5) * periodo - largura / 2).astype(np.int64)
+        retoma = int(np.ceil((BITS_QUADRO - 0.5) * periodo))   # meio do stop
+    # int32 basta para capturas de até 2 G amostras e gasta metade da memória
+    tipo = np.int32 if len(b) < 2**31 else np.int64
+    acumulado = np.concatenate(([0], np.cumsum(b, dtype=tipo)))
+    vazio = Quadros(b'', np.zeros(0, np.uint8), np.zeros(0, np.int64))
+    if len(b) < 2:
+        return vazio
+
+    if modo == 'arduino':
+        # digitalRead: sem filtro e sem conferir o start
+        nivel = b
+        def valido(s):
+            return True
+        bordas = bordas_descida(nivel)
+    else:
+        nivel = filtra(acumulado, int(round(fs / baud * filtro)))
+        def valido(s):
+            # start ainda em 0 no meio do bit: descarta glitches
+            return 2 * soma_janelas(acumulado, s + centros[0], largura) < largura
+        bordas = bordas_descida(nivel)
+        bordas = bordas[valido(bordas)]
+
+    inicios = encadeia(nivel, bordas, valido, retoma, centros[-1] + largura)
+    if len(inicios) == 0:
+        return vazio
+
+    # todos os bits de todos os quadros: matriz (quadros, 11)
+    posicoes = inicios[:, None] + centros[None, :]
+    bits = (2 * soma_janelas(acumulado, posicoes, largura) > largura).astype(np.uint8)
+
+    dados = np.packbits(bits[:, 1:9], axis=1, bitorder='little')[:, 0]
+    erros = np.zeros(len(inicios), np.uint8)
+    erros[PARIDADE[dados] != bits[:, 9]] |= ERRO_PARIDADE
+    erros[bits[:, 10] == 0] |= ERRO_STOP
+    return Quadros(dados.tobytes(), erros, inicios)
+
+
+def quadros_bits(dados, stop=4):
+    """Matriz (bytes, 10 + stop) com os bits de cada quadro, na ordem da linha."""
+    d = np.frombuffer(bytes(dados), dtype=np.uint8)
+    bits = np.ones((len(d), 10 + stop), dtype=np.uint8)
+    bits[:, 0] = 0
+    bits[:, 1:9] = np.unpackbits(d[:, None], axis=1, bitorder='little')
+    bits[:, 9] = PARIDADE[d]
+    return bits
+
+
+def gera(dados, fs, baud=BAUD, stop=4, skew=0.0, jitter=0.0, ruido=0.0, ocioso=2.0, rng=None):
+    """
+    Forma de onda que o transmissor.ino gera para dados.
+
+    stop    períodos em 1 depois da paridade (o .ino usa 4)
+    skew    erro relativo do relógio do transmissor (0.02 = 2% mais rápido)
+    jitter  desvio padrão de cada borda, em frações de bit
+    ruido   desvio padrão do ruído somado ao nível (0/1); com ruido > 0
+            o retorno é analógico (float32), senão bool
+    ocioso  bits em repouso antes do primeiro e depois do último quadro
+
+    Retorna (x, inicios): as amostras e a amostra do start de cada quadro.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    q = quadros_bits(dados, stop)
+    niveis = np.concatenate(([1], q.ravel(), [1]))
+    periodo = fs / (baud * (1 + skew))
+    # instante (em amostras) do começo de cada bit
+    bordas = (ocioso + np.arange(len(niveis) - 1)) * periodo
+    if jitter:
+        bordas = bordas + rng.normal(0.0, jitter * periodo, len(bordas))
+    bordas = np.concatenate(([0.0], np.maximum.accumulate(bordas)))
+    fim = bordas[-1] + ocioso * periodo
+    cortes = np.round(np.concatenate((bordas, [fim]))).astype(np.int64)
+    x = np.repeat(niveis.astype(bool), np.diff(cortes))
+    inicios = cortes[1:-1][:-1].reshape(-1, q.shape[1])[:, 0] if len(q) else np.zeros(0, np.int64)
+    if ruido:
+        x = x.astype(np.float32) + rng.normal(0.0, ruido, len(x)).astype(np.float32)
+    return x, inicios
+
+
+def carrega(caminho):
+    """Captura em .npy ou .csv/.txt (última coluna = nível)."""
+    if caminho.endswith('.npy'):
+        return np.load(caminho)
+    dados = np.loadtxt(caminho, delimiter=',', ndmin=2)
+    return dados[:, -1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='decodifica uma captura da UART do p5')
+    parser.add_argument('captura')
+    parser.add_argument('fs', type=float, help='taxa de amostragem da captura (Hz)')
+    parser.add_argument('--baud', type=int, default=BAUD)
+    parser.add_argument('--modo', default='maioria', choices=['maioria', 'arduino'])
+    parser.add_argument('--limiar', type=float, default=None)
+    args = parser.parse_args()
+
+    q = decodifica(carrega(args.captura), args.fs, args.baud, args.limiar, args.modo)
+    print(f"{len(q.dados)} quadros, {np.count_nonzero(q.erros & ERRO_PARIDADE)} erros de paridade, "
+          f"{np.count_nonzero(q.erros & ERRO_STOP)} erros de stop")
+    texto = bytes(c if 32 <= c < 127 else ord('.') for c in q.dados)
+    print(texto.decode('ascii'))
+    if np.any(q.erros):
+        print("quadros com erro:", np.flatnonzero(q.erros).tolist()[:50])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# acordes.py
+"""
+Dicionários de acordes gerados pelo temperamento igual e índice vetorizado
+para casar picos com acordes.
+
+generate_accords() monta, a partir da tabela de notas (A4 = 440 Hz,
+f = 440·2^((midi-69)/12)), um dicionário no mesmo formato do ACCORDS
+para cada raiz, qualidade e inversão pedidas (408 acordes por oitava
+com todas as QUALIDADES e inversões).
+
+ChordIndex guarda as notas distintas do dicionário num vetor ordenado e a
+pertinência de cada nota a cada acorde numa matriz booleana
+(acordes x notas). Casar um conjunto de picos vira: um searchsorted dos
+picos contra as notas (quais notas têm pico a menos de tolerance Hz) e
+um produto matriz-vetor que conta as notas presentes de cada acorde.
+"""
+import numpy as np
+
+A4 = 440.0
+
+NOMES_NOTAS = ['Dó', 'Dó#', 'Ré', 'Ré#', 'Mi', 'Fá', 'Fá#', 'Sol', 'Sol#', 'Lá', 'Lá#', 'Si']
+CHAVES_NOTAS = ['do', 'do#', 're', 're#', 'mi', 'fa', 'fa#', 'sol', 'sol#', 'la', 'la#', 'si']
+
+# qualidade -> (intervalos em semitons a partir da raiz, nome)
+QUALIDADES = {
+    'maior':     ((0, 4, 7), 'Maior'),
+    'menor':     ((0, 3, 7), 'Menor'),
+    'menor_5b':  ((0, 3, 6), 'Menor 5b'),
+    'aumentado': ((0, 4, 8), 'Aumentado'),
+    'sus2':      ((0, 2, 7), 'Sus2'),
+    'sus4':      ((0, 5, 7), 'Sus4'),
+    '7':         ((0, 4, 7, 10), 'com Sétima'),
+    'maior_7':   ((0, 4, 7, 11), 'com Sétima Maior'),
+    'menor_7':   ((0, 3, 7, 10), 'Menor com Sétima'),
+    'menor_7_5b': ((0, 3, 6, 10), 'Meio-Diminuto'),
+}
+
+
+def note_freq(midi, a4=A4):
+    """Frequência de uma nota MIDI (69 = Lá 4) no temperamento igual."""
+    return a4 * 2.0 ** ((np.asarray(midi, dtype=float) - 69) / 12)
+
+
+def note_table(oitavas=range(2, 8), a4=A4):
+    """Tabela {(nota, oitava): frequência} das oitavas pedidas (Dó 4 = MIDI 60)."""
+    return {(CHAVES_NOTAS[n], o): float(note_freq(12 * (o + 1) + n, a4))
+            for o in oitavas for n in range(12)}
+
+
+def generate_accords(oitavas=(4, 5), qualidades=QUALIDADES, inversoes=True, a4=A4):
+    """
+    Dicionário de acordes no formato do ACCORDS.
+
+    oitavas     oitavas das raízes (a raiz Dó 5 dá o "do_maior" do ACCORDS)
+    qualidades  subconjunto de QUALIDADES (nomes ou o próprio dicionário)
+    inversoes   inclui as inversões (a nota mais grave sobe uma oitava)
+
+    Chaves como 'do5_maior' e 'do5_maior_inv1'; além de 'freqs' e 'nome'
+    cada entrada leva 'raiz', 'oitava', 'qualidade' e 'inversao'.
+    """
+    accords = {}
+    for oitava in oitavas:
+        for n in range(12):
+            raiz = 12 * (oitava + 1) + n
+            for qualidade in qualidades:
+                intervalos, nome_qualidade = QUALIDADES[qualidade]
+                notas = [raiz + i for i in intervalos]
+                for inversao in range(len(notas) if inversoes else 1):
+                    midis = notas[inversao:] + [m + 12 for m in notas[:inversao]]
+                    chave = f"{CHAVES_NOTAS[n]}{oitava}_{qualidade}"
+                    nome = f"{NOMES_NOTAS[n]} {nome_qualidade}"
+                    if inversao:
+                        chave += f"_inv{inversao}"
+                        nome += f" ({inversao}ª inversão)"
+                    accords[chave] = {
+                        "freqs": [float(f) for f in note_freq(midis, a4)],
+                        "nome": nome,
+                        "raiz": CHAVES_NOTAS[n],
+                        "oitava": oitava,
+                        "qualidade": qualidade,
+                        "inversao": inversao,
+                    }
+    return accords
+
+
+class ChordIndex:
+    """
+    Índice de um dicionário de acordes (ACCORDS ou generate_accords()).
+
+    notes       frequências distintas, em ordem
+    membership  matriz booleana (acordes x notas)
+    sizes       número de notas de cada acorde
+    """
+
+    def __init__(self, accords):
+        self.accords = accords
+        self.keys = list(accords)
+        self.names = [accords[k]['nome'] for k in self.keys]
+        todas = [np.asarray(accords[k]['freqs'], dtype=float) for k in self.keys]
+        self.notes, inversa = np.unique(np.concatenate(todas), return_inverse=True)
+        self.sizes = np.array([len(f) for f in todas])
+        linhas = np.repeat(np.arange(len(todas)), self.sizes)
+        self.membership = np.zeros((len(todas), len(self.notes)), dtype=bool)
+        self.membership[linhas, inversa] = True
+        # contagem por produto de matrizes (float32 vai pelo BLAS)
+        self._pesos = self.membership.T.astype(np.float32)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def present_notes(self, peak_freqs, tolerance=5.0):
+        """Vetor booleano: nota i tem algum pico a menos de tolerance Hz."""
+        picos = np.sort(np.asarray(peak_freqs, dtype=float))
+        if len(picos) == 0:
+            return np.zeros(len(self.notes), dtype=bool)
+        j = np.searchsorted(picos, self.notes)
+        # pico vizinho de cada lado de cada nota
+        esquerda = picos[np.clip(j - 1, 0, len(picos) - 1)]
+        direita = picos[np.clip(j, 0, len(picos) - 1)]
+        distancia = np.minimum(np.abs(self.notes - esquerda), np.abs(direita - self.notes))
+        return distancia <= tolerance
+
+    def scores(self, peak_freqs, tolerance=5.0):
+        """Quantas notas de cada acorde têm pico (um valor por acorde)."""
+        presentes = self.present_notes(peak_freqs, tolerance).astype(np.float32)
+        return (presentes @ self._pesos).astype(np.int64)
+
+    def rank(self, peak_freqs, tolerance=5.0, top_k=5, n_peaks=5):
+        """
+        Os top_k acordes para os n_peaks picos mais fortes: lista de
+        (chave, nome, score, fração das notas do acorde presentes),
+        do melhor para o pior. Empates no score vão para o acorde com
+        maior fração presente e depois para o que vem antes no dicionário.
+        """
+        score = self.scores(np.asarray(peak_freqs)[:n_peaks], tolerance)
+        fracao = score / self.sizes
+        ordem = np.lexsort((np.arange(len(score)), -fracao, -score))[:top_k]
+        return [(self.keys[i], self.names[i], int(score[i]), float(fracao[i])) for i in ordem]
+
+    def match(self, peak_freqs, tolerance=5.0, n_peaks=5, min_score=3):
+        """Mesmo resultado do map_peaks_to_chord: (nome, score)."""
+        score = self.scores(np.asarray(peak_freqs)[:n_peaks], tolerance)
+        if len(score) == 0:
+            return "Acorde Não Identificado", 0
+        melhor = int(np.argmax(score))
+        if score[melhor] < min_score:
+            return "Acorde Não Identificado", int(score[melhor])
+        return self.names[melhor], int(score[melhor])
@@ -0,0 +1,161 @@
+# benchmark.py
+"""
+Compara os caminhos de detecção do p6 em acordes sintéticos (generate_chord
+com ruído branco).
+
+    python benchmark.py goertzel      # FFT + picos x banco de Goertzel
+    python benchmark.py indice        # laço do map_peaks_to_chord x ChordIndex
+    python benchmark.py precisao      # erro de frequência x duração do quadro
+
+goertzel mede o tempo por decisão de cada caminho e quantos acordes do
+ACCORDS foram identificados; indice mede o casamento de picos em
+dicionários gerados (acordes.generate_accords) de tamanho crescente;
+precisao mede, para cada duração de quadro, o erro das frequências dos
+picos com e sem interpolação entre bins e a taxa de acerto com a
+tolerância de 2 Hz do receptor.
+"""
+import time
+import argparse
+
+import numpy as np
+
+from fft_utils import ACCORDS, compute_fft, find_prominent_peaks, map_peaks_to_chord, generate_chord
+from goertzel import GoertzelBank
+from acordes import ChordIndex, generate_accords
+
+FS = 44100
+
+
+def cronometra(funcao, repeticoes):
+    """Menor tempo médio (s) de funcao() em 3 rodadas de repeticoes chamadas."""
+    melhor = float('inf')
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        melhor = min(melhor, (time.perf_counter() - inicio) / repeticoes)
+    return melhor
+
+
+def acordes_sinteticos(T, ruido, rng):
+    sinais = {}
+    for chave, dados in ACCORDS.items():
+        _, x = generate_chord(dados['freqs'], FS, T=T)
+        sinais[dados['nome']] = x + ruido * rng.standard_normal(len(x))
+    return sinais
+
+
+def bench_goertzel(args):
+    rng = np.random.default_rng(args.semente)
+    print(f"{'caminho':<34}{'amostras':>10}{'tempo/decisão':>16}{'acertos':>10}")
+    for T in args.duracoes:
+        sinais = acordes_sinteticos(T, args.ruido, rng)
+        N = len(next(iter(sinais.values())))
+        banco = GoertzelBank.para_acordes(FS, segmento=N)
+
+        def via_fft(x):
+            freqs, magnitude, _ = compute_fft(x, FS, window='hann')
+            picos, _ = find_prominent_peaks(freqs, magnitude, min_peak_count=5)
+            return map_peaks_to_chord(picos, ACCORDS, tolerance=2.0)[0]
+
+        def via_goertzel(x):
+            picos, _ = banco.peaks(banco.magnitudes(x))
+            return map_peaks_to_chord(picos, ACCORDS, tolerance=2.0)[0]
+
+        def via_goertzel_blocos(x):
+            # como no callback: blocos de args.bloco amostras com estado
+            for inicio in range(0, N, args.bloco):
+                prontos = banco.alimenta(x[inicio:inicio + args.bloco])
+            picos, _ = banco.peaks(prontos[-1])
+            return map_peaks_to_chord(picos, ACCORDS, tolerance=2.0)[0]
+
+        x0 = next(iter(sinais.values()))
+        repeticoes = max(1, int(args.repeticoes * 132300 / N))
+        for nome, funcao in (('rfft + find_prominent_peaks', via_fft),
+                             ('Goertzel (segmento inteiro)', via_goertzel),
+                             (f'Goertzel (blocos de {args.bloco})', via_goertzel_blocos)):
+            acertos = sum(funcao(x) == esperado for esperado, x in sinais.items())
+            tempo = cronometra(lambda: funcao(x0), repeticoes)
+            print(f"{nome:<34}{N:>10}{tempo * 1e3:>13.3f} ms{acertos:>7}/{len(sinais)}")
+        print()
+
+
+def bench_indice(args):
+    rng = np.random.default_rng(args.semente)
+    print(f"{'oitavas':>8}{'acordes':>9}{'laço':>13}{'índice':>13}{'montagem':>13}")
+    for n in args.oitavas:
+        accords = generate_accords(oitavas=range(5 - n // 2, 5 - n // 2 + n))
+        inicio = time.perf_counter()
+        indice = ChordIndex(accords)
+        montagem = time.perf_counter() - inicio
+        # picos: as notas de um acorde qualquer com um erro de até 1 Hz
+        chave = rng.choice(indice.keys)
+        picos = np.asarray(accords[chave]['freqs']) + rng.uniform(-1, 1, len(accords[chave]['freqs']))
+        assert map_peaks_to_chord(picos, accords, 2.0) == map_peaks_to_chord(picos, indice, 2.0)
+        laco = cronometra(lambda: map_peaks_to_chord(picos, accords, 2.0), max(1, args.repeticoes // n))
+        vetor = cronometra(lambda: indice.rank(picos, 2.0, top_k=5), args.repeticoes * 10)
+        print(f"{n:>8}{len(accords):>9}{laco * 1e3:>10.3f} ms{vetor * 1e3:>10.3f} ms{montagem * 1e3:>10.1f} ms")
+
+
+def bench_precisao(args):
+    rng = np.random.default_rng(args.semente)
+    print(f"{'quadro':>8}{'interpolação':>14}{'erro médio':>13}{'erro p95':>11}{'acertos':>10}{'tempo':>12}")
+    for ms in args.quadros:
+        N = int(round(ms * 1e-3 * FS))
+        # trechos de N amostras de cada acorde começando em instantes
+        # aleatórios (fases aleatórias) com ruído branco
+        casos = []
+        for dados in ACCORDS.values():
+            _, x = generate_chord(dados['freqs'], FS, T=ms * 1e-3 + 0.05)
+            for _ in range(args.repeticoes):
+                inicio = rng.integers(0, len(x) - N)
+                casos.append((dados, x[inicio:inicio + N] + args.ruido * rng.standard_normal(N)))
+        for interpolacao in (None, 'linear', 'log'):
+            erros = []
+            acertos = 0
+            inicio = time.perf_counter()
+            for dados, x in casos:
+                freqs, magnitude, _ = compute_fft(x, FS, window='hann')
+                picos, _ = find_prominent_peaks(freqs, magnitude, min_peak_count=5, interpolation=interpolacao)
+                acertos += map_peaks_to_chord(picos, ACCORDS, tolerance=2.0)[0] == dados['nome']
+                if len(picos):
+                    erros.extend(np.abs(picos[:5, None] - np.asarray(dados['freqs'])[None, :]).min(axis=0))
+            tempo = (time.perf_counter() - inicio) / len(casos)
+            erros = np.asarray(erros)
+            print(f"{ms:>6g}ms{str(interpolacao):>14}{np.mean(erros):>10.2f} Hz{np.percentile(erros, 95):>8.2f} Hz"
+                  f"{acertos / len(casos):>9.0%}{tempo * 1e3:>9.2f} ms")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmarks da detecção de acordes do p6')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('goertzel', help='FFT + picos x banco de Goertzel')
+    p.add_argument('--duracoes', type=float, nargs='+', default=[3.0, 0.5, 0.1])
+    p.add_argument('--bloco', type=int, default=512)
+    p.add_argument('--ruido', type=float, default=0.05)
+    p.add_argument('--repeticoes', type=int, default=20)
+    p.add_argument('--semente', type=int, default=0)
+    p.set_defaults(funcao=bench_goertzel)
+
+    p = sub.add_parser('indice', help='laço do map_peaks_to_chord x ChordIndex')
+    p.add_argument('--oitavas', type=int, nargs='+', default=[1, 2, 4, 8])
+    p.add_argument('--repeticoes', type=int, default=20)
+    p.add_argument('--semente', type=int, default=0)
+    p.set_defaults(funcao=bench_indice)
+
+    p = sub.add_parser('precisao', help='erro de frequência x duração do quadro')
+    p.add_argument('--quadros', type=float, nargs='+', default=[25, 50, 100, 200, 500, 3000],
+                   help='durações dos quadros (ms)')
+    p.add_argument('--ruido', type=float, default=0.05)
+    p.add_argument('--repeticoes', type=int, default=20, help='trechos por acorde')
+    p.add_argument('--semente', type=int, default=0)
+    p.set_defaults(funcao=bench_precisao)
+
+    args = parser.parse_args()
+    args.funcao(args)
+
+
+if __name__ == "__main__":
+    main()
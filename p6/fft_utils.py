@@ -1,8 +1,13 @@
 # fft_utils.py
+from functools import lru_cache
+
 import numpy as np
-import matplotlib.pyplot as plt
+import scipy.fft as sp_fft
 from scipy.signal import find_peaks
 
+from acordes import ChordIndex
+from sintetizador import ChordSynth
+
 # --- DEFINIÇÕES DE FREQUÊNCIA ---
 ACCORDS = {
     "do_maior": {"freqs": [523.25, 659.25, 783.99], "nome": "Dó Maior"},
@@ -17,38 +22,91 @@ ACCORDS = {
 
 # --- FUNÇÕES DE FFT E PLOTAGEM (DO ARQUIVO BASE DO PROFESSOR) ---
 
-def compute_fft(x, fs, window=None, nfft=None, return_complex=False):
-    # ... (Copie a função compute_fft do arquivo do professor aqui)
-    x = np.asarray(x, dtype=float)
-    N = x.size
+# Janelas aceitas por compute_fft (None = retangular)
+WINDOWS = {'hann': np.hanning, 'hamming': np.hamming, 'blackman': np.blackman}
+
+
+@lru_cache(maxsize=64)
+def get_window(window, N, dtype=float):
+    """Janela de N pontos e sua soma (para a normalização), guardadas por (tipo, N)."""
+    if window is None:
+        w = np.ones(N)
+    else:
+        try:
+            w = WINDOWS[window.lower()](N)
+        except KeyError:
+            raise ValueError(f"janela desconhecida: {window!r} (use {', '.join(WINDOWS)} ou None)")
+    scale = np.sum(w) if np.sum(w) != 0 else N
+    w = w.astype(dtype)
+    w.flags.writeable = False
+    return w, scale
+
+
+@lru_cache(maxsize=64)
+def get_scale(window, N, nfft, dtype=float):
+    """Fator que leva |X| à amplitude de cada senoide (2/soma(w), 1/soma(w) no DC e em Nyquist)."""
+    _, scale = get_window(window, N)
+    fator = np.full(nfft // 2 + 1, 2.0 / scale)
+    fator[0] = 1.0 / scale
+    if nfft % 2 == 0:
+        fator[-1] = 1.0 / scale
+    fator = fator.astype(dtype)
+    fator.flags.writeable = False
+    return fator
 
 
-    if window.lower() == 'hann':
-        w = np.hanning(N)
-    elif window.lower() == 'hamming':
-        w = np.hamming(N)
-    elif window.lower() == 'blackman':
-        w = np.blackman(N)
+@lru_cache(maxsize=64)
+def get_freqs(nfft, fs):
+    freqs = sp_fft.rfftfreq(nfft, d=1.0/fs)
+    freqs.flags.writeable = False
+    return freqs
 
-    xw = x * w
+
+def compute_fft(x, fs, window=None, nfft=None, return_complex=False, axis=-1, fast_len=False, workers=None):
+    """
+    Espectro unilateral de x (ou de cada quadro, se x for 2-D).
+
+    x            sinal 1-D, ou vários quadros do mesmo tamanho empilhados;
+                 a FFT é feita ao longo de axis, numa chamada só
+    window       'hann', 'hamming', 'blackman' ou None (retangular)
+    nfft         tamanho da FFT (padrão: o tamanho do quadro)
+    fast_len     arredonda nfft para cima até um tamanho rápido
+                 (scipy.fft.next_fast_len)
+    workers      threads do scipy.fft (útil em lotes grandes)
+
+    Janelas, fatores de normalização e eixos de frequência ficam em cache
+    por tamanho, então chamadas repetidas com quadros do mesmo tamanho só
+    pagam a FFT.
+    """
+    x = np.asarray(x)
+    if not np.issubdtype(x.dtype, np.floating):
+        x = x.astype(float)
+    axis = axis % x.ndim
+    N = x.shape[axis]
+
+    # forma que alinha vetores 1-D com o eixo da FFT
+    forma = [1] * x.ndim
+    forma[axis] = -1
+
+    if window is None:
+        xw = x
+    else:
+        w, _ = get_window(window, N, x.dtype)
+        xw = x * w.reshape(forma)
 
     # nfft
     if nfft is None:
         nfft = N
+    if fast_len:
+        nfft = sp_fft.next_fast_len(nfft, real=True)
 
-    # FFT unilateral com numpy.rfft
-    X = np.fft.rfft(xw, n=nfft)
-    freqs = np.fft.rfftfreq(nfft, d=1.0/fs)
+    # FFT unilateral
+    X = sp_fft.rfft(xw, n=nfft, axis=axis, workers=workers)
+    freqs = get_freqs(nfft, fs)
 
-    # normalização
-    scale = np.sum(w) if np.sum(w) != 0 else N
-    magnitude = np.abs(X) / scale
-
-    # ajustar fator 2 para termos positivos
-    if nfft % 2 == 0:
-        magnitude[1:-1] *= 2.0
-    else:
-        magnitude[1:] *= 2.0
+    # normalização, já com o fator 2 dos termos positivos
+    magnitude = np.abs(X)
+    magnitude *= get_scale(window, N, nfft, magnitude.dtype).reshape(forma)
 
     # evitar log(0)
     eps = 1e-12
@@ -61,6 +119,9 @@ def compute_fft(x, fs, window=None, nfft=None, return_complex=False):
 
 def plot_time_and_spectrum(t, x, fs, freqs, magnitude, magnitude_db, title_suffix=''):
     """Plota sinal no tempo e espectros (linear + dB)."""
+    # importado aqui para o resto do módulo rodar sem matplotlib (lote.py)
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(12, 8))
 
     # Plot Tempo
@@ -92,25 +153,60 @@ def generate_sin(freq, time, fs, amplitude=1.0):
     return t, s
 
 def generate_chord(freqs, fs, T=3.0, amplitude=0.9):
-    """Gera um sinal de áudio (acorde) somando três senoides."""
-    
-    # O tempo é gerado pela primeira frequência para garantir o vetor t
-    t, chord_signal = generate_sin(freqs[0], T, fs, amplitude=0.0) # sinal inicializado com zeros
+    """Gera um sinal de áudio (acorde) somando as senoides das notas."""
+    n = int(T * fs)
+    t = np.linspace(0.0, T, n, endpoint=False)
+
+    # A amplitude é dividida entre as notas para evitar saturação (0.9 / 3 = 0.3 por senoide)
+    synth = ChordSynth(fs, amplitude=amplitude)
+    synth.toca(freqs, imediato=True)
+    # o ChordSynth calcula em float32; a saída continua float64 como antes
+    chord_signal = synth.gera(np.empty(n, dtype=np.float32)).astype(np.float64)
 
-    # A amplitude é dividida por 3 para evitar saturação (0.9 / 3 = 0.3 por senoide)
-    amp_per_sin = amplitude / len(freqs) 
-    
-    for f in freqs:
-        _, s_comp = generate_sin(f, T, fs, amplitude=amp_per_sin)
-        chord_signal += s_comp
-        
     return t, chord_signal
     
 # --- FUNÇÕES DE DETECÇÃO DE PICO ---
 
-def find_prominent_peaks(freqs, magnitude, min_peak_count=5):
+def interpolate_peaks(freqs, magnitude, peaks_indices, interpolation='log'):
+    """
+    Frequência e amplitude de cada pico entre os bins.
+
+    Ajusta uma parábola ao bin do pico e aos dois vizinhos e devolve o
+    vértice. Com interpolation='log' a parábola é ajustada ao log da
+    magnitude (interpolação gaussiana: quase sem viés nas janelas de
+    Hann/Hamming/Blackman); com 'linear', à magnitude.
+    Picos nas bordas do espectro ficam no centro do bin.
+    """
+    peaks_indices = np.asarray(peaks_indices, dtype=int)
+    peak_freqs = freqs[peaks_indices].astype(float)
+    peak_mags = magnitude[peaks_indices].astype(float)
+    interno = (peaks_indices > 0) & (peaks_indices < len(magnitude) - 1)
+    k = peaks_indices[interno]
+    if interpolation is None or len(k) == 0:
+        return peak_freqs, peak_mags
+    vizinhos = magnitude[np.stack((k - 1, k, k + 1))].astype(float)
+    if interpolation == 'log':
+        vizinhos = np.log(np.maximum(vizinhos, 1e-300))
+    elif interpolation != 'linear':
+        raise ValueError(f"interpolação desconhecida: {interpolation!r} (use 'log', 'linear' ou None)")
+    a, b, c = vizinhos
+    denominador = a - 2 * b + c
+    # deslocamento do vértice em bins (0 se os três pontos não formam um pico)
+    p = np.clip(0.5 * (a - c) / np.where(denominador < 0, denominador, -np.inf), -0.5, 0.5)
+    altura = b - 0.25 * (a - c) * p
+    df = freqs[1] - freqs[0]
+    peak_freqs[interno] = freqs[k] + p * df
+    peak_mags[interno] = np.exp(altura) if interpolation == 'log' else altura
+    return peak_freqs, peak_mags
+
+
+def find_prominent_peaks(freqs, magnitude, min_peak_count=5, interpolation='log'):
     """
     Encontra os picos mais proeminentes no espectro, tentando garantir um mínimo.
+
+    As frequências saem refinadas entre os bins (ver interpolate_peaks),
+    então quadros curtos (50-100 ms) já cabem na tolerância de 2 Hz do
+    receptor; interpolation=None devolve os centros dos bins.
     """
     # 1. Encontrar picos, ajustando a proeminência dinamicamente
     peaks_indices = np.array([])
@@ -133,9 +229,8 @@ def find_prominent_peaks(freqs, magnitude, min_peak_count=5):
     valid_indices = (freqs[peaks_indices] > 450) & (freqs[peaks_indices] < 1400)
     peaks_indices = peaks_indices[valid_indices]
 
-    # 3. Obter a frequência e magnitude dos picos filtrados
-    peak_freqs = freqs[peaks_indices]
-    peak_mags = magnitude[peaks_indices]
+    # 3. Obter a frequência e magnitude dos picos filtrados (refinadas entre os bins)
+    peak_freqs, peak_mags = interpolate_peaks(freqs, magnitude, peaks_indices, interpolation)
 
     # 4. Ordenar os picos pela magnitude (do maior para o menor)
     sorted_indices = np.argsort(peak_mags)[::-1]
@@ -146,7 +241,12 @@ def find_prominent_peaks(freqs, magnitude, min_peak_count=5):
 def map_peaks_to_chord(peak_freqs, ACCORDS, tolerance=5.0):
     """
     Compara as frequências dos picos com as frequências dos acordes conhecidos.
+
+    ACCORDS pode ser o dicionário ou um acordes.ChordIndex já montado
+    (dicionários grandes: o índice casa todos os acordes de uma vez).
     """
+    if isinstance(ACCORDS, ChordIndex):
+        return ACCORDS.match(peak_freqs, tolerance=tolerance)
     
     # 1. Usar as 3 frequências mais proeminentes (reais)
     top_3_peaks = peak_freqs[:5]
@@ -0,0 +1,92 @@
+# goertzel.py
+"""
+Banco de filtros de Goertzel sintonizado nas notas do ACCORDS.
+
+Para saber qual acorde está tocando basta a energia das ~12 notas que
+aparecem no ACCORDS, não o espectro inteiro. O Goertzel calcula um termo
+da DFT em O(N) por nota, na frequência exata da nota (sem grade de bins).
+
+A recorrência do Goertzel, amostra por amostra, seria lenta em Python.
+O banco usa a forma fechada equivalente: cada bloco é multiplicado pela
+matriz pré-calculada w[n]·exp(-j·2π·f·n/fs) (segmento x notas), uma
+chamada de BLAS por bloco, O(N·k). O estado entre blocos é só o
+acumulador complexo de cada nota e a posição dentro do segmento, então
+alimenta() pode rodar no callback de áudio com blocos de qualquer tamanho.
+
+peaks() devolve (freqs, mags) ordenados do mais forte para o mais fraco,
+o mesmo formato do find_prominent_peaks, e o resultado vai direto para o
+map_peaks_to_chord.
+"""
+import numpy as np
+
+from fft_utils import ACCORDS, get_window
+
+
+def chord_notes(accords=ACCORDS):
+    """Frequências distintas de todas as notas de um dicionário de acordes, em ordem."""
+    return np.unique(np.concatenate([np.asarray(a['freqs'], dtype=float) for a in accords.values()]))
+
+
+class GoertzelBank:
+    """
+    freqs     frequências das notas (Hz)
+    fs        taxa de amostragem
+    segmento  amostras somadas em cada medida de energia
+    window    janela aplicada ao segmento (como no compute_fft)
+    """
+
+    def __init__(self, freqs, fs, segmento=4096, window='hann'):
+        self.freqs = np.asarray(freqs, dtype=float)
+        self.fs = fs
+        self.segmento = segmento
+        self.window = window
+        w, scale = get_window(window, segmento)
+        n = np.arange(segmento)
+        # kernel[n, k] = w[n] exp(-j w_k n), já com a normalização do compute_fft
+        fase = np.exp(-2j * np.pi * np.outer(n, self.freqs) / fs)
+        self.kernel = (w[:, None] * fase * (2.0 / scale)).astype(np.complex64)
+        self.acumulado = np.zeros(len(self.freqs), dtype=np.complex64)
+        self.pos = 0
+
+    @classmethod
+    def para_acordes(cls, fs, accords=ACCORDS, **kwargs):
+        return cls(chord_notes(accords), fs, **kwargs)
+
+    def reset(self):
+        self.acumulado[:] = 0
+        self.pos = 0
+
+    def magnitudes(self, x):
+        """Amplitude de cada nota num segmento inteiro (sem estado), ou em cada linha de x."""
+        x = np.asarray(x, dtype=np.float32)
+        if x.shape[-1] != self.segmento:
+            raise ValueError(f"o segmento tem {self.segmento} amostras, não {x.shape[-1]}")
+        return np.abs(x @ self.kernel)
+
+    def alimenta(self, bloco):
+        """
+        Acumula um bloco de qualquer tamanho; retorna a lista das amplitudes
+        (uma por nota) de cada segmento que terminou dentro dele.
+        """
+        bloco = np.asarray(bloco, dtype=np.float32)
+        prontos = []
+        i = 0
+        while i < len(bloco):
+            n = min(len(bloco) - i, self.segmento - self.pos)
+            self.acumulado += bloco[i:i + n] @ self.kernel[self.pos:self.pos + n]
+            self.pos += n
+            i += n
+            if self.pos == self.segmento:
+                prontos.append(np.abs(self.acumulado))
+                self.reset()
+        return prontos
+
+    def peaks(self, mags, limiar=0.3):
+        """Notas com pelo menos limiar x a maior amplitude, da mais forte para a mais fraca."""
+        mags = np.asarray(mags)
+        maior = mags.max() if len(mags) else 0.0
+        if maior <= 0:
+            return self.freqs[:0], mags[:0]
+        ordem = np.argsort(mags)[::-1]
+        ordem = ordem[mags[ordem] >= limiar * maior]
+        return self.freqs[ordem], mags[ordem]
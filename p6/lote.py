@@ -0,0 +1,192 @@
+# lote.py
+"""
+Identificação de acordes em lote, sem microfone e sem gráficos.
+
+Cada WAV passa pelo mesmo caminho do receptor (compute_fft ->
+find_prominent_peaks -> ChordIndex) num pool de processos; os
+arquivos são distribuídos em lotes de --lote arquivos e os resultados
+são gravados (CSV ou JSON Lines, pela extensão de --saida) à medida que
+ficam prontos. Rodar de novo com a mesma saída pula os arquivos que já
+estão nela.
+
+    python lote.py gravacoes/ --saida acordes.csv
+    python lote.py a/ b/ x.wav --saida acordes.jsonl --engine goertzel --processos 8
+"""
+import os
+import csv
+import json
+import time
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+from acordes import ChordIndex, generate_accords
+from fft_utils import ACCORDS, compute_fft, find_prominent_peaks
+from goertzel import GoertzelBank
+
+CAMPOS = ['arquivo', 'acorde', 'score', 'picos', 'duracao', 'erro']
+EXTENSOES = ('.wav', '.flac', '.ogg')
+# amostras por segmento do Goertzel (~0,37 s a 44,1 kHz, resolução de ~2,7 Hz)
+SEGMENTO = 16384
+
+# estado de cada processo do pool (montado uma vez em inicializa)
+_config = {}
+
+
+def lista_arquivos(caminhos):
+    """Arquivos de áudio dos caminhos (diretórios são percorridos recursivamente), em ordem."""
+    arquivos = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for raiz, _, nomes in os.walk(caminho):
+                arquivos.extend(os.path.join(raiz, n) for n in nomes if n.lower().endswith(EXTENSOES))
+        else:
+            arquivos.append(caminho)
+    return sorted(arquivos)
+
+
+def repara(saida):
+    """Corta uma última linha incompleta (processo interrompido no meio de uma escrita)."""
+    if not os.path.exists(saida):
+        return
+    with open(saida, 'rb+') as f:
+        dados = f.read()
+        if dados and not dados.endswith(b'\n'):
+            f.truncate(dados.rfind(b'\n') + 1)
+
+
+def ja_feitos(saida):
+    """Arquivos que já têm resultado na saída (para retomar)."""
+    if not os.path.exists(saida):
+        return set()
+    with open(saida, newline='', encoding='utf-8') as f:
+        if saida.endswith('.csv'):
+            return {linha['arquivo'] for linha in csv.DictReader(f)}
+        feitos = set()
+        for linha in f:
+            try:
+                feitos.add(json.loads(linha)['arquivo'])
+            except (ValueError, KeyError):
+                pass
+        return feitos
+
+
+def inicializa(accords, engine, tolerance, max_segundos):
+    _config.update(index=ChordIndex(accords), accords=accords, engine=engine,
+                   tolerance=tolerance, max_segundos=max_segundos, bancos={})
+
+
+def identifica(picos):
+    """
+    (nome, score) como no map_peaks_to_chord, mas empates no score vão
+    para o acorde com mais das suas notas presentes (ChordIndex.rank):
+    no dicionário gerado uma tríade não sai como o acorde de 4 notas
+    que a contém.
+    """
+    _, nome, score, _ = _config['index'].rank(picos, _config['tolerance'], top_k=1)[0]
+    if score < 3:
+        return "Acorde Não Identificado", score
+    return nome, score
+
+
+def analisa(arquivo):
+    """Resultado (dicionário com CAMPOS) de um arquivo; erros viram o campo erro."""
+    import soundfile as sf
+    resultado = dict(arquivo=arquivo, acorde='', score=0, picos='', duracao=0.0, erro='')
+    try:
+        fs = sf.info(arquivo).samplerate
+        frames = -1 if _config['max_segundos'] is None else int(_config['max_segundos'] * fs)
+        x, fs = sf.read(arquivo, frames=frames, dtype='float32', always_2d=True)
+        x = x.mean(axis=1)
+        resultado['duracao'] = round(len(x) / fs, 3)
+        if len(x) < 2:
+            raise ValueError("arquivo vazio")
+        if _config['engine'] == 'goertzel':
+            # um banco por taxa de amostragem, com kernel de SEGMENTO amostras
+            # qualquer que seja o tamanho do arquivo; a energia de cada nota é
+            # a média dos segmentos completos; um arquivo mais curto que um
+            # segmento é completado com zeros
+            if fs not in _config['bancos']:
+                _config['bancos'][fs] = GoertzelBank.para_acordes(fs, _config['accords'], segmento=SEGMENTO)
+            banco = _config['bancos'][fs]
+            banco.reset()
+            mags = banco.alimenta(x)
+            if not mags:
+                mags = banco.alimenta(np.zeros(banco.segmento - banco.pos, dtype=np.float32))
+            picos, _ = banco.peaks(np.mean(mags, axis=0))
+        else:
+            freqs, magnitude, _ = compute_fft(x, fs, window='hann')
+            picos, _ = find_prominent_peaks(freqs, magnitude, min_peak_count=5)
+        acorde, score = identifica(picos)
+        resultado.update(acorde=acorde, score=score, picos=';'.join(f"{p:.2f}" for p in picos[:5]))
+    except Exception as e:
+        resultado['erro'] = f"{type(e).__name__}: {e}"
+    return resultado
+
+
+class Escritor:
+    """Acrescenta os resultados na saída, um por linha, e força o flush."""
+
+    def __init__(self, saida):
+        self.csv = saida.endswith('.csv')
+        novo = not os.path.exists(saida) or os.path.getsize(saida) == 0
+        self.f = open(saida, 'a', newline='', encoding='utf-8')
+        if self.csv:
+            self.writer = csv.DictWriter(self.f, fieldnames=CAMPOS)
+            if novo:
+                self.writer.writeheader()
+
+    def escreve(self, resultado):
+        if self.csv:
+            self.writer.writerow(resultado)
+        else:
+            self.f.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+        self.f.flush()
+
+    def fecha(self):
+        self.f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='identifica o acorde de cada gravação de um diretório')
+    parser.add_argument('caminhos', nargs='+', help='diretórios e/ou arquivos de áudio')
+    parser.add_argument('--saida', required=True, help='resultados em .csv ou .jsonl')
+    parser.add_argument('--processos', type=int, default=None, help='padrão: todos os núcleos')
+    parser.add_argument('--lote', type=int, default=16, help='arquivos por tarefa do pool')
+    parser.add_argument('--engine', default='fft', choices=['fft', 'goertzel'])
+    parser.add_argument('--tolerance', type=float, default=2.0, help='tolerância em Hz')
+    parser.add_argument('--max-segundos', type=float, default=None, help='analisa só o começo de cada arquivo')
+    parser.add_argument('--gerado', action='store_true',
+                        help='usa o dicionário gerado (acordes.generate_accords) em vez do ACCORDS')
+    args = parser.parse_args()
+
+    arquivos = lista_arquivos(args.caminhos)
+    repara(args.saida)
+    feitos = ja_feitos(args.saida)
+    pendentes = [a for a in arquivos if a not in feitos]
+    print(f"{len(arquivos)} arquivos, {len(arquivos) - len(pendentes)} já na saída, {len(pendentes)} a analisar")
+    if not pendentes:
+        return
+
+    accords = generate_accords() if args.gerado else ACCORDS
+    escritor = Escritor(args.saida)
+    inicio = time.perf_counter()
+    erros = 0
+    try:
+        with Pool(args.processos, initializer=inicializa,
+                  initargs=(accords, args.engine, args.tolerance, args.max_segundos)) as pool:
+            for i, resultado in enumerate(pool.imap_unordered(analisa, pendentes, chunksize=args.lote), 1):
+                escritor.escreve(resultado)
+                erros += bool(resultado['erro'])
+                if i % 100 == 0 or i == len(pendentes):
+                    decorrido = time.perf_counter() - inicio
+                    print(f"  {i}/{len(pendentes)} ({i / decorrido:.1f} arquivos/s, {erros} com erro)")
+    finally:
+        escritor.fecha()
+    decorrido = time.perf_counter() - inicio
+    print(f"{len(pendentes)} arquivos em {decorrido:.1f} s ({len(pendentes) / decorrido:.1f} arquivos/s)")
+
+
+if __name__ == "__main__":
+    main()
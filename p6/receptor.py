@@ -1,13 +1,16 @@
 # receptor.py
+import argparse
 import numpy as np
 import sounddevice as sd
 import matplotlib.pyplot as plt
 from fft_utils import ACCORDS, compute_fft, find_prominent_peaks, map_peaks_to_chord, plot_time_and_spectrum
+from streaming import StreamingChordDetector, detecta_wav
 
 # --- CONFIGURAÇÃO ---
 FS = 44100      # Frequência de amostragem
 DURATION = 3.0  # Duração da gravação em segundos (deve ser maior que a emissão)
 DELAY = 0      # Tempo para iniciar a gravação após o início do script
+BLOCO = 512     # Amostras por callback no modo contínuo
 
 # --- MAIN RECEPTOR ---
 def receiver_main():
@@ -59,5 +62,45 @@ def receiver_main():
     
     plt.show()
 
+# --- RECEPTOR CONTÍNUO ---
+def imprime_deteccao(evento, anterior):
+    """Imprime só quando o acorde suavizado muda."""
+    if evento.acorde != anterior:
+        picos = ", ".join(f"{f:.1f}" for f in evento.picos[:3])
+        print(f"[{evento.tempo:7.2f} s] {evento.acorde} (score {evento.score}/3; picos: {picos})")
+    return evento.acorde
+
+def receiver_stream(wav=None, engine='fft'):
+    print("--- LADO RECEPTOR: IDENTIFICADOR DE ACORDES (CONTÍNUO) ---")
+    anterior = None
+
+    if wav is not None:
+        # arquivo no lugar do microfone, em blocos do mesmo tamanho do callback
+        for evento in detecta_wav(wav, bloco=BLOCO, engine=engine):
+            anterior = imprime_deteccao(evento, anterior)
+        return
+
+    detector = StreamingChordDetector(FS, engine=engine)
+    print(f"Janela de {detector.frame} amostras, hop de {detector.hop}; "
+          f"latência típica {detector.latencia() * 1000:.0f} ms. Ctrl+C para sair.")
+    with sd.InputStream(samplerate=FS, channels=1, dtype='float32', blocksize=BLOCO,
+                        callback=detector.callback):
+        try:
+            while True:
+                for evento in detector.espera(timeout=1.0):
+                    anterior = imprime_deteccao(evento, anterior)
+        except KeyboardInterrupt:
+            pass
+    print(f"Overflows de entrada: {detector.overflows}, hops pulados: {detector.atrasos}")
+
 if __name__ == "__main__":
-    receiver_main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="identificador de acordes")
+    parser.add_argument("--stream", action="store_true", help="detecção contínua (hop a hop)")
+    parser.add_argument("--wav", help="lê o áudio de um WAV em vez do microfone (implica --stream)")
+    parser.add_argument("--engine", default="fft", choices=["fft", "goertzel"],
+                        help="motor de detecção do modo contínuo")
+    args = parser.parse_args()
+    if args.stream or args.wav:
+        receiver_stream(args.wav, args.engine)
+    else:
+        receiver_main()
\ No newline at end of file
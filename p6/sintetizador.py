@@ -0,0 +1,141 @@
+# sintetizador.py
+"""
+Sintetizador de acordes por blocos, com fase contínua.
+
+Todas as notas de um bloco saem de uma conta só: a matriz de fases
+(notas x amostras) é o produto externo das frequências angulares pelo
+índice da amostra, mais a fase de cada nota no começo do bloco; o seno é
+calculado em cima dela e a soma ponderada pelos ganhos vai para o buffer
+de saída. Tudo em float32, em buffers alocados uma vez.
+
+Entre blocos só a fase de cada nota é guardada (reduzida a [0, 2π)),
+então o sinal não tem emenda e pode tocar para sempre. Trocar de acorde
+(toca) faz as notas que saem descerem e as que entram subirem numa rampa
+de `rampa` segundos, sem clique; notas comuns aos dois acordes continuam
+com a mesma fase.
+
+    synth = ChordSynth(44100)
+    synth.toca(ACCORDS['do_maior']['freqs'])
+    with sd.OutputStream(samplerate=44100, channels=1, dtype='float32', callback=synth.callback):
+        ...
+"""
+import numpy as np
+
+
+class ChordSynth:
+    """
+    fs         taxa de amostragem
+    amplitude  pico do acorde inteiro (dividido entre as notas, como no generate_chord)
+    rampa      duração (s) da subida/descida das notas ao trocar de acorde
+    bloco      maior bloco calculado de uma vez (blocos maiores são divididos)
+    max_notas  notas soando ao mesmo tempo (as que entram + as que saem)
+    """
+
+    def __init__(self, fs, amplitude=0.9, rampa=0.01, bloco=2048, max_notas=16):
+        self.fs = fs
+        self.amplitude = amplitude
+        self.rampa = max(1, int(rampa * fs))
+        self.bloco = bloco
+        self.max_notas = max_notas
+        self.freqs = np.zeros(0, dtype=np.float64)
+        self.omega = np.zeros(0, dtype=np.float32)     # rad/amostra
+        self.fases = np.zeros(0, dtype=np.float64)     # fase no começo do próximo bloco
+        self.ganhos = np.zeros(0, dtype=np.float32)
+        self.alvos = np.zeros(0, dtype=np.float32)
+        self.passos = np.zeros(0, dtype=np.float32)    # variação do ganho por amostra
+        self.n = np.arange(bloco, dtype=np.float32)
+        self.n1 = self.n + 1
+        self._fase = np.empty((max_notas, bloco), dtype=np.float32)
+        self._ganho = np.empty((max_notas, bloco), dtype=np.float32)
+
+    def toca(self, freqs, imediato=False):
+        """
+        Troca o acorde (lista vazia = silêncio). Com imediato as notas já
+        começam no ganho final, sem rampa (para gerar um trecho pronto).
+        """
+        novas, vezes = np.unique(np.asarray(freqs, dtype=np.float64), return_counts=True)
+        if len(novas) > self.max_notas:
+            raise ValueError(f"acorde com {len(novas)} notas; max_notas = {self.max_notas}")
+        entram = novas[~np.isin(novas, self.freqs)]
+        excesso = len(self.freqs) + len(entram) - self.max_notas
+        if excesso > 0:
+            # sem espaço: cortam primeiro as notas que estão saindo com menor ganho
+            saindo = np.flatnonzero(~np.isin(self.freqs, novas))
+            corta = np.zeros(len(self.freqs), bool)
+            corta[saindo[np.argsort(self.ganhos[saindo])][:excesso]] = True
+            self._remove(corta)
+        # como no generate_chord, cada nota leva amplitude / len(freqs);
+        # uma frequência repetida soma as suas partes
+        alvo = self.amplitude * vezes / max(1, vezes.sum())
+        # notas que já soam e continuam (ou voltam) mantêm a fase
+        self.freqs = np.concatenate((self.freqs, entram))
+        self.omega = (2 * np.pi * self.freqs / self.fs).astype(np.float32)
+        self.fases = np.concatenate((self.fases, np.zeros(len(entram))))
+        self.ganhos = np.concatenate((self.ganhos, np.zeros(len(entram), dtype=np.float32)))
+        tocando = np.isin(self.freqs, novas)
+        self.alvos = np.zeros(len(self.freqs), dtype=np.float32)
+        self.alvos[tocando] = alvo[np.searchsorted(novas, self.freqs[tocando])]
+        if imediato:
+            self.ganhos[:] = self.alvos
+        self.passos = (self.alvos - self.ganhos) / self.rampa
+
+    def _remove(self, mascara):
+        fica = ~mascara
+        self.freqs, self.omega, self.fases = self.freqs[fica], self.omega[fica], self.fases[fica]
+        self.ganhos, self.alvos, self.passos = self.ganhos[fica], self.alvos[fica], self.passos[fica]
+
+    def gera(self, out):
+        """Preenche out (float32, 1-D) com as próximas len(out) amostras."""
+        for inicio in range(0, len(out), self.bloco):
+            self._bloco(out[inicio:inicio + self.bloco])
+        return out
+
+    def _bloco(self, out):
+        B = len(out)
+        k = len(self.freqs)
+        if k == 0:
+            out[:] = 0
+            return
+        fase = self._fase[:k, :B]
+        ganho = self._ganho[:k, :B]
+        # fase[i, j] = fases[i] + omega[i] * j  (produto externo)
+        np.multiply(self.omega[:, None], self.n[None, :B], out=fase)
+        fase += self.fases[:, None].astype(np.float32)
+        np.sin(fase, out=fase)
+        # ganho[i, j] anda passos[i] por amostra até o alvo
+        np.multiply(self.passos[:, None], self.n1[None, :B], out=ganho)
+        ganho += self.ganhos[:, None]
+        np.clip(ganho, np.minimum(self.ganhos, self.alvos)[:, None],
+                np.maximum(self.ganhos, self.alvos)[:, None], out=ganho)
+        # out = soma das notas ponderadas
+        fase *= ganho
+        np.sum(fase, axis=0, out=out)
+        self.ganhos = ganho[:, -1].copy()
+        # a fase que atravessa os blocos é acumulada em float64, com a frequência exata
+        self.fases = np.mod(self.fases + 2 * np.pi * self.freqs * (B / self.fs), 2 * np.pi)
+        # notas que terminaram de descer saem do banco
+        mudas = (self.ganhos == 0) & (self.alvos == 0)
+        if mudas.any():
+            self._remove(mudas)
+
+    def callback(self, outdata, frames, time, status):
+        """Callback do sounddevice.OutputStream (um canal float32)."""
+        self.gera(outdata[:, 0])
+
+    def blocos(self, sequencia, bloco=1024, repetir=False):
+        """
+        Gera blocos de `bloco` amostras tocando a sequência de
+        (freqs, segundos); com repetir, a sequência recomeça sem fim.
+        O buffer devolvido é sempre o mesmo (copie se for guardar).
+        """
+        out = np.empty(bloco, dtype=np.float32)
+        while True:
+            for freqs, segundos in sequencia:
+                self.toca(freqs)
+                restante = int(round(segundos * self.fs))
+                while restante > 0:
+                    n = min(bloco, restante)
+                    yield self.gera(out[:n])
+                    restante -= n
+            if not repetir:
+                return
@@ -0,0 +1,169 @@
+# streaming.py
+"""
+Detector de acordes contínuo.
+
+Em vez de gravar 3 s e fazer uma FFT enorme, o áudio entra aos poucos num
+buffer circular (pelo callback do sounddevice.InputStream ou lido de um
+WAV) e a cada hop a última janela de `frame` amostras passa pelo mesmo
+caminho do receptor: compute_fft -> find_prominent_peaks ->
+map_peaks_to_chord. O resultado de cada hop é suavizado por voto de
+maioria nos últimos hops, então um acorde só é anunciado quando aparece
+na maioria deles.
+
+Com os valores padrão (frame de 4096, hop de 1024 a 44,1 kHz) a janela
+tem 93 ms e sai uma detecção a cada 23 ms; a memória é só a do buffer.
+"""
+import threading
+from collections import Counter, deque, namedtuple
+
+import numpy as np
+
+from acordes import ChordIndex
+from fft_utils import ACCORDS, compute_fft, find_prominent_peaks, map_peaks_to_chord
+from goertzel import GoertzelBank
+
+NAO_IDENTIFICADO = "Acorde Não Identificado"
+
+# tempo: fim da janela analisada (s, desde o começo do stream)
+# acorde: resultado suavizado; bruto: resultado só desta janela
+Deteccao = namedtuple('Deteccao', ['tempo', 'acorde', 'score', 'bruto', 'picos'])
+
+
+class RingBuffer:
+    """
+    Buffer circular de amostras. escreve() roda no callback de áudio;
+    le() roda em outra thread e confere depois de copiar se o escritor
+    não sobrescreveu o trecho enquanto ela lia.
+    """
+
+    def __init__(self, capacidade, dtype=np.float32):
+        self.dados = np.zeros(capacidade, dtype=dtype)
+        self.capacidade = capacidade
+        self.total = 0      # amostras escritas desde o começo
+
+    def escreve(self, bloco):
+        n = len(bloco)
+        if n > self.capacidade:
+            bloco = bloco[-self.capacidade:]
+            self.total += n - self.capacidade
+            n = self.capacidade
+        i = self.total % self.capacidade
+        primeiro = min(n, self.capacidade - i)
+        self.dados[i:i + primeiro] = bloco[:primeiro]
+        self.dados[:n - primeiro] = bloco[primeiro:]
+        self.total += n
+
+    def le(self, fim, out):
+        """Copia as len(out) amostras que terminam em fim; False se já foram sobrescritas."""
+        n = len(out)
+        inicio = fim - n
+        if inicio < 0 or fim > self.total or self.total - inicio > self.capacidade:
+            return False
+        i = inicio % self.capacidade
+        primeiro = min(n, self.capacidade - i)
+        out[:primeiro] = self.dados[i:i + primeiro]
+        out[primeiro:] = self.dados[:n - primeiro]
+        return self.total - inicio <= self.capacidade
+
+
+class StreamingChordDetector:
+    """
+    Detector por hops sobre um RingBuffer.
+
+    frame       amostras de cada janela analisada
+    hop         amostras entre duas análises
+    nfft        tamanho da FFT (padrão: frame; os picos já saem interpolados)
+    tolerance   tolerância do map_peaks_to_chord (Hz)
+    suavizacao  quantos hops entram no voto de maioria
+    limiar_rms  janelas mais fracas que isso contam como silêncio
+    engine      'fft' (espectro inteiro + picos) ou 'goertzel' (só as
+                notas do accords, ver goertzel.py)
+    """
+
+    def __init__(self, fs, frame=4096, hop=1024, nfft=None, window='hann', tolerance=2.0,
+                 suavizacao=5, limiar_rms=1e-3, accords=ACCORDS, capacidade=None, engine='fft'):
+        self.fs = fs
+        self.frame = frame
+        self.hop = hop
+        self.nfft = max(nfft or frame, frame)
+        self.window = window
+        self.tolerance = tolerance
+        self.limiar_rms = limiar_rms
+        self.accords = accords
+        self.index = ChordIndex(accords)
+        if engine not in ('fft', 'goertzel'):
+            raise ValueError(f"engine desconhecida: {engine!r}")
+        self.engine = engine
+        self.bank = None
+        if engine == 'goertzel':
+            self.bank = GoertzelBank.para_acordes(fs, accords, segmento=frame, window=window)
+        self.ring = RingBuffer(capacidade or 4 * frame + 8 * hop)
+        self.janela = np.zeros(frame, dtype=np.float32)
+        self.historico = deque(maxlen=suavizacao)
+        self.proximo = frame        # fim da próxima janela a analisar
+        self.novo = threading.Event()
+        self.overflows = 0          # status.input_overflow do PortAudio
+        self.atrasos = 0            # hops pulados porque o buffer deu a volta
+
+    def latencia(self):
+        """Atraso típico (s) entre o começo de um acorde e o anúncio dele."""
+        meio_frame = self.frame / 2
+        voto = (self.historico.maxlen // 2) * self.hop
+        return (meio_frame + voto + self.hop) / self.fs
+
+    def callback(self, indata, frames, time, status):
+        """Callback do sounddevice.InputStream: só copia para o buffer."""
+        if status.input_overflow:
+            self.overflows += 1
+        self.ring.escreve(indata[:, 0])
+        self.novo.set()
+
+    def alimenta(self, bloco):
+        """Entrada síncrona (WAV, testes): escreve e já processa."""
+        self.ring.escreve(np.asarray(bloco, dtype=np.float32))
+        return self.processa()
+
+    def espera(self, timeout=None):
+        """Espera o callback trazer áudio novo e processa os hops completos."""
+        self.novo.wait(timeout)
+        self.novo.clear()
+        return self.processa()
+
+    def processa(self):
+        """Analisa todas as janelas completas que chegaram; retorna as detecções."""
+        eventos = []
+        while self.ring.total >= self.proximo:
+            if not self.ring.le(self.proximo, self.janela):
+                # o consumidor ficou para trás: pula para a janela mais recente
+                self.atrasos += 1
+                self.proximo += (self.ring.total - self.proximo) // self.hop * self.hop
+                continue
+            eventos.append(self.analisa(self.janela, self.proximo / self.fs))
+            self.proximo += self.hop
+        return eventos
+
+    def analisa(self, x, tempo):
+        picos = np.zeros(0)
+        acorde, score = NAO_IDENTIFICADO, 0
+        if np.sqrt(np.mean(np.square(x))) >= self.limiar_rms:
+            if self.bank is not None:
+                picos, _ = self.bank.peaks(self.bank.magnitudes(x))
+            else:
+                freqs, magnitude, _ = compute_fft(x, self.fs, window=self.window, nfft=self.nfft)
+                picos, _ = find_prominent_peaks(freqs, magnitude, min_peak_count=5)
+            acorde, score = map_peaks_to_chord(picos, self.index, tolerance=self.tolerance)
+        self.historico.append(acorde)
+        votado, votos = Counter(self.historico).most_common(1)[0]
+        if 2 * votos <= len(self.historico):
+            votado = NAO_IDENTIFICADO
+        return Deteccao(tempo, votado, score, acorde, picos[:5])
+
+
+def detecta_wav(caminho, bloco=512, **kwargs):
+    """Gera as detecções de um WAV lido em blocos, como se viesse do microfone."""
+    import soundfile as sf
+    fs = sf.info(caminho).samplerate
+    detector = StreamingChordDetector(fs, **kwargs)
+    for dados in sf.blocks(caminho, blocksize=bloco, dtype='float32', always_2d=True):
+        for evento in detector.alimenta(dados.mean(axis=1)):
+            yield evento
@@ -1,12 +1,15 @@
 # emissor.py4
+import argparse
 import numpy as np
 import sounddevice as sd
 import matplotlib.pyplot as plt
 from fft_utils import ACCORDS, compute_fft, generate_chord, plot_time_and_spectrum
+from sintetizador import ChordSynth
 
 # --- CONFIGURAÇÃO ---
 FS = 44100 # Frequência de amostragem
 DURATION = 8.0 # Duração da emissão em segundos
+BLOCO = 1024 # Amostras por callback no modo contínuo
 
 # --- MAIN EMISSOR ---
 def emitter_main():
@@ -55,5 +58,61 @@ def emitter_main():
     print("Reprodução finalizada.")
     plt.show()
 
+# --- EMISSOR CONTÍNUO ---
+def emitter_stream(chaves, duracao_nota=DURATION, repetir=True, wav=None):
+    """
+    Toca a sequência de acordes bloco a bloco (memória constante, começa na
+    hora); com repetir a sequência volta ao começo até Ctrl+C. Com wav a
+    sequência é gravada no arquivo em vez de tocada.
+    """
+    for chave in chaves:
+        if chave not in ACCORDS:
+            print(f"Acorde desconhecido: {chave}")
+            return
+    print("--- LADO EMISSOR: GERADOR DE ACORDES (CONTÍNUO) ---")
+    sequencia = [(ACCORDS[c]['freqs'], duracao_nota) for c in chaves]
+    synth = ChordSynth(FS)
+
+    if wav is not None:
+        import soundfile as sf
+        with sf.SoundFile(wav, 'w', samplerate=FS, channels=1) as f:
+            for bloco in synth.blocos(sequencia, BLOCO):
+                f.write(bloco)
+        print(f"Sequência gravada em {wav}.")
+        return
+
+    blocos = synth.blocos(sequencia, BLOCO, repetir=repetir)
+    fim = []
+
+    def callback(outdata, frames, time, status):
+        bloco = next(blocos, None)
+        if bloco is None:
+            outdata[:] = 0
+            fim.append(True)
+            raise sd.CallbackStop
+        outdata[:len(bloco), 0] = bloco
+        outdata[len(bloco):] = 0
+
+    print("Reproduzindo: " + " -> ".join(ACCORDS[c]['nome'] for c in chaves)
+          + (" (em loop, Ctrl+C para sair)" if repetir else ""))
+    with sd.OutputStream(samplerate=FS, channels=1, dtype='float32', blocksize=BLOCO,
+                         callback=callback):
+        try:
+            while not fim:
+                sd.sleep(100)
+        except KeyboardInterrupt:
+            pass
+    print("Reprodução finalizada.")
+
 if __name__ == "__main__":
-    emitter_main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="gerador de acordes")
+    parser.add_argument("--stream", nargs="+", metavar="ACORDE",
+                        help="toca a sequência de acordes em blocos, sem gerar o buffer inteiro")
+    parser.add_argument("--duracao-nota", type=float, default=DURATION, help="segundos de cada acorde")
+    parser.add_argument("--uma-vez", action="store_true", help="toca a sequência só uma vez")
+    parser.add_argument("--wav", help="grava a sequência num WAV em vez de tocar")
+    args = parser.parse_args()
+    if args.stream:
+        emitter_stream(args.stream, args.duracao_nota, not args.uma_vez, args.wav)
+    else:
+        emitter_main()
\ No newline at end of file
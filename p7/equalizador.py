@@ -0,0 +1,103 @@
+# equalizador.py
+import numpy as np
+from scipy.signal import sosfilt, sosfreqz
+
+
+def peaking_sos(frequencias, ganhos_db, Q, fs):
+    """As linhas SOS [b0 b1 b2 1 a1 a2] do peaking_eq de todas as bandas de uma vez."""
+    A = 10**(np.asarray(ganhos_db, dtype=float) / 40)
+    omega = 2 * np.pi * np.asarray(frequencias, dtype=float) / fs
+    alpha = np.sin(omega) / (2 * np.asarray(Q, dtype=float))
+    cos = -2 * np.cos(omega)
+    a0 = 1 + alpha / A
+    sos = np.empty((len(A), 6))
+    sos[:, 0] = (1 + alpha * A) / a0
+    sos[:, 1] = cos / a0
+    sos[:, 2] = (1 - alpha * A) / a0
+    sos[:, 3] = 1.0
+    sos[:, 4] = cos / a0
+    sos[:, 5] = (1 - alpha / A) / a0
+    return sos
+
+
+class Equalizer:
+    """
+    Equalizador de N bandas (peaking_eq em cascata) numa matriz SOS.
+
+    Todas as bandas passam numa chamada só do sosfilt, e o estado de cada
+    biquad (zi) fica guardado entre as chamadas: processar o sinal em
+    blocos dá exatamente o mesmo resultado que processar tudo de uma vez.
+    Bandas com 0 dB (filtro identidade) ficam de fora da cascata, a não ser
+    com pula_0db=False (ganhos que mudam o tempo todo, ver tempo_real.py).
+    Bandas em fs/2 ou acima (o biquad seria instável) nunca entram: o
+    ganho delas é guardado mas ignorado (ver validas).
+
+    frequencias  centro de cada banda (Hz)
+    ganhos_db    ganho de cada banda (dB)
+    Q            fator de qualidade (um para todas ou um por banda)
+    dtype        float64 ou float32 (coeficientes, estado e saída)
+    bloco        maior trecho filtrado de uma vez em process(..., out=x);
+                 limita a memória temporária do processamento in-place
+    """
+
+    def __init__(self, frequencias, ganhos_db, Q=1.0, fs=44100, dtype=np.float64, bloco=16384,
+                 pula_0db=True):
+        self.frequencias = np.asarray(frequencias, dtype=float)
+        self.fs = fs
+        self.validas = (self.frequencias > 0) & (self.frequencias < fs / 2)
+        self.pula_0db = pula_0db
+        self.dtype = np.dtype(dtype)
+        self.bloco = bloco
+        # estado de todas as bandas (as de 0 dB também, para poderem voltar)
+        self.zi = np.zeros((len(self.frequencias), 2), dtype=self.dtype)
+        self.ativas = np.zeros(len(self.frequencias), dtype=bool)
+        self.set_gains(ganhos_db, Q)
+
+    def set_gains(self, ganhos_db, Q=None):
+        """Recalcula os coeficientes; o estado das bandas que continuam ativas é mantido."""
+        self.ganhos_db = np.broadcast_to(np.asarray(ganhos_db, dtype=float), self.frequencias.shape).copy()
+        if Q is not None:
+            self.Q = np.broadcast_to(np.asarray(Q, dtype=float), self.frequencias.shape).copy()
+        ativas = self.validas & (self.ganhos_db != 0) if self.pula_0db else self.validas.copy()
+        # bandas que acabaram de entrar começam do repouso
+        self.zi[ativas & ~self.ativas] = 0
+        self.ativas = ativas
+        sos = peaking_sos(self.frequencias[ativas], self.ganhos_db[ativas], self.Q[ativas], self.fs)
+        self.sos = sos.astype(self.dtype)
+
+    def reset(self):
+        self.zi[:] = 0
+
+    def process(self, x, out=None):
+        """
+        Filtra x (1-D) continuando do estado da chamada anterior.
+
+        Com out (pode ser o próprio x) o resultado é escrito nele, em
+        trechos de self.bloco amostras; senão devolve um array novo
+        em self.dtype. A conta é sempre em self.dtype (x é convertido),
+        então o zi guardado é exatamente o que o sosfilt devolveu.
+        """
+        x = np.asarray(x)
+        if out is None:
+            out = np.empty(x.shape, dtype=self.dtype)
+        if len(self.sos) == 0:
+            out[...] = x
+            return out
+        zi = self.zi[self.ativas]
+        for inicio in range(0, len(x), self.bloco):
+            trecho = slice(inicio, inicio + self.bloco)
+            out[trecho], zi = sosfilt(self.sos, x[trecho].astype(self.dtype, copy=False), zi=zi)
+        if not np.isfinite(zi).all():
+            # entrada com NaN/inf: o estado não se recupera sozinho,
+            # então volta ao repouso em vez de deixar a saída muda
+            zi = np.zeros_like(zi)
+            np.nan_to_num(out, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        self.zi[self.ativas] = zi
+        return out
+
+    def response(self, worN=8000):
+        """(frequências em Hz, resposta complexa) da cascata inteira."""
+        if len(self.sos) == 0:
+            w = np.linspace(0, self.fs / 2, worN, endpoint=False)
+            return w, np.ones(worN, dtype=complex)
+        return sosfreqz(self.sos.astype(np.float64), worN=worN, fs=self.fs)
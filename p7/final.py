@@ -2,10 +2,10 @@
 import numpy as np
 import sounddevice as sd
 import matplotlib.pyplot as plt
-from scipy.signal import lfilter, freqz, convolve
 
 # util do professor
-from util import peaking_eq, graf
+from util import graf
+from equalizador import Equalizer
 
 
 def main():
@@ -42,15 +42,9 @@ def main():
     audio_original = audio_original / np.max(np.abs(audio_original)) # normalizacao
 
     # ---------- EQUALIZACAO ----------
-    sinal_filtrado = audio_original.copy()
-    b_coeffs_list = []
-    a_coeffs_list = []
     print("\nAplicando 12 filtros em cascata...")
-    for f0, gain_db in zip(frequencias, ganhos_db):
-        b_i, a_i = peaking_eq(f0, gain_db, Q_valor, fs)
-        b_coeffs_list.append(b_i)
-        a_coeffs_list.append(a_i)
-        sinal_filtrado = lfilter(b_i, a_i, sinal_filtrado) # aplica filtro
+    eq = Equalizer(frequencias, ganhos_db, Q_valor, fs) # bandas em 0 dB ficam de fora
+    sinal_filtrado = eq.process(audio_original) # aplica a cascata inteira (sosfilt)
     sinal_filtrado = sinal_filtrado / np.max(np.abs(sinal_filtrado)) # normalizacao
     print("filtragem concluida.")
     
@@ -75,13 +69,7 @@ def main():
     plt.show()
 
     # ---------- DIAGRAMA DE BODE ----------
-    b_total = b_coeffs_list[0]
-    a_total = a_coeffs_list[0]
-    for i in range(1, len(b_coeffs_list)):
-        b_total = convolve(b_total, b_coeffs_list[i])
-        a_total = convolve(a_total, a_coeffs_list[i])
-
-    w, h = freqz(b_total, a_total, fs=fs, worN=8000)
+    w, h = eq.response(worN=8000)
 
     plt.figure(figsize=(12, 6))
     plt.semilogx(w, 20 * np.log10(abs(h)))
@@ -0,0 +1,263 @@
+# tempo_real.py
+# equalizador de 12 bandas em tempo real (sd.Stream duplex)
+import sys
+import time
+import argparse
+import threading
+
+import numpy as np
+
+from equalizador import Equalizer
+
+FS = 44100
+BLOCO = 256                 # amostras por callback (5,8 ms a 44,1 kHz)
+FREQUENCIAS = np.array([20, 32, 64, 125, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000])
+PRESET = np.array([0, 0, 8, 3, 10, -20, -20, -20, 0, 10, 5, 0])
+
+
+class Status:
+    """Substituto do sd.CallbackFlags para o StreamWav."""
+    input_overflow = False
+    output_underflow = False
+
+
+class EqualizadorTempoReal:
+    """
+    Equalizador rodando dentro do callback de um sd.Stream duplex.
+
+    set_gains()/set_q() podem ser chamados de qualquer thread: o pedido é
+    só trocado por referência, e o callback leva os ganhos (em dB) e os Q
+    (em escala log) até o pedido em `transicao` segundos, recalculando os
+    coeficientes a cada `sub_bloco` amostras. O estado zi de cada biquad é
+    mantido durante a rampa, então a troca não tem clique.
+
+    Cada callback é cronometrado: tempos[] guarda a fração do período do
+    bloco gasta no processamento (1.0 = estourou o prazo).
+    """
+
+    def __init__(self, frequencias=FREQUENCIAS, ganhos_db=0.0, Q=1.0, fs=FS,
+                 transicao=0.05, sub_bloco=32, historico=4096):
+        self.fs = fs
+        self.transicao = transicao
+        self.sub_bloco = sub_bloco
+        self.eq = Equalizer(frequencias, ganhos_db, Q, fs, pula_0db=False)
+        self.ganhos = self.eq.ganhos_db.copy()      # valores atuais (mudam na rampa)
+        self.logq = np.log(self.eq.Q)
+        self._pedido = (self.ganhos.copy(), self.logq.copy())
+        self._aplicado = self._pedido
+        self._passos = None
+        # instrumentação
+        self.tempos = np.zeros(historico)
+        self.callbacks = 0
+        self.underflows = 0
+        self.overflows = 0
+        self.estouros = 0           # callbacks que passaram do período do bloco
+
+    # --- controle (qualquer thread) ---
+
+    def set_gains(self, ganhos_db):
+        ganhos, logq = self._pedido
+        self._pedido = (np.broadcast_to(np.asarray(ganhos_db, dtype=float), ganhos.shape).copy(), logq)
+
+    def set_gain(self, banda, ganho_db):
+        ganhos = self._pedido[0].copy()
+        ganhos[banda] = ganho_db
+        self.set_gains(ganhos)
+
+    def set_q(self, Q):
+        ganhos, logq = self._pedido
+        self._pedido = (ganhos, np.log(np.broadcast_to(np.asarray(Q, dtype=float), logq.shape)).copy())
+
+    # --- callback ---
+
+    def _rampa(self, n):
+        """Anda n amostras na rampa; True se os coeficientes mudaram."""
+        pedido = self._pedido
+        if pedido is not self._aplicado:
+            # novo pedido: passos por amostra para chegar lá em `transicao`
+            self._aplicado = pedido
+            amostras = max(1.0, self.transicao * self.fs)
+            self._passos = ((pedido[0] - self.ganhos) / amostras, (pedido[1] - self.logq) / amostras)
+        if self._passos is None:
+            return False
+        alvo_g, alvo_q = self._aplicado
+        passo_g, passo_q = self._passos
+        self.ganhos = np.where(np.abs(alvo_g - self.ganhos) <= np.abs(passo_g * n), alvo_g, self.ganhos + passo_g * n)
+        self.logq = np.where(np.abs(alvo_q - self.logq) <= np.abs(passo_q * n), alvo_q, self.logq + passo_q * n)
+        if np.array_equal(self.ganhos, alvo_g) and np.array_equal(self.logq, alvo_q):
+            self._passos = None
+        self.eq.set_gains(self.ganhos, np.exp(self.logq))
+        return True
+
+    def processa(self, x, out):
+        """Filtra um bloco (1-D) em out, com a rampa dos coeficientes se houver."""
+        if self._passos is None and self._pedido is self._aplicado:
+            self.eq.process(x, out=out)
+            return
+        for inicio in range(0, len(x), self.sub_bloco):
+            trecho = slice(inicio, inicio + self.sub_bloco)
+            self._rampa(len(x[trecho]))
+            self.eq.process(x[trecho], out=out[trecho])
+
+    def callback(self, indata, outdata, frames, time_info, status):
+        inicio = time.perf_counter()
+        if status.output_underflow:
+            self.underflows += 1
+        if status.input_overflow:
+            self.overflows += 1
+        self.processa(indata[:, 0], outdata[:, 0])
+        if outdata.shape[1] > 1:
+            outdata[:, 1:] = outdata[:, :1]
+        carga = (time.perf_counter() - inicio) * self.fs / frames
+        self.tempos[self.callbacks % len(self.tempos)] = carga
+        self.callbacks += 1
+        if carga >= 1.0:
+            self.estouros += 1
+
+    def estatisticas(self):
+        n = min(self.callbacks, len(self.tempos))
+        cargas = self.tempos[:n] if n else np.zeros(1)
+        return {
+            'callbacks': self.callbacks,
+            'carga_media': float(np.mean(cargas)),
+            'carga_p99': float(np.percentile(cargas, 99)),
+            'carga_max': float(np.max(cargas)),
+            'estouros': self.estouros,
+            'underflows': self.underflows,
+            'overflows': self.overflows,
+        }
+
+
+class StreamWav:
+    """
+    Faz o papel do sd.Stream lendo a entrada de um WAV e gravando a saída
+    em outro, com o mesmo callback(indata, outdata, frames, time, status).
+    Com tempo_real os blocos saem no ritmo do relógio (como na placa, com
+    `folga` blocos de buffer); atrasar mais que o buffer conta como
+    output_underflow no callback seguinte.
+    """
+
+    def __init__(self, entrada, saida, blocksize=BLOCO, callback=None, tempo_real=True, folga=2):
+        import soundfile as sf
+        self.sf = sf
+        self.entrada = entrada
+        self.saida = saida
+        self.blocksize = blocksize
+        self.callback = callback
+        self.tempo_real = tempo_real
+        self.folga = folga
+        self.samplerate = sf.info(entrada).samplerate
+        self.thread = None
+        self.parar = threading.Event()
+
+    def _roda(self):
+        status = Status()
+        periodo = self.blocksize / self.samplerate
+        outdata = np.zeros((self.blocksize, 1), dtype=np.float32)
+        with self.sf.SoundFile(self.saida, 'w', samplerate=self.samplerate, channels=1) as saida:
+            prazo = time.perf_counter()
+            for bloco in self.sf.blocks(self.entrada, blocksize=self.blocksize, dtype='float32', always_2d=True):
+                if self.parar.is_set():
+                    break
+                indata = bloco.mean(axis=1, keepdims=True)
+                n = len(indata)
+                self.callback(indata, outdata[:n], n, None, status)
+                saida.write(outdata[:n, 0])
+                if self.tempo_real:
+                    prazo += periodo
+                    espera = prazo - time.perf_counter()
+                    status.output_underflow = espera < -self.folga * periodo
+                    if espera > 0:
+                        time.sleep(espera)
+                    elif status.output_underflow:
+                        prazo = time.perf_counter()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._roda, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.parar.set()
+        self.thread.join()
+
+    @property
+    def active(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def comando(rt, linha):
+    """Interpreta uma linha do terminal; False para sair."""
+    partes = linha.split()
+    if not partes:
+        return True
+    if partes[0] == 'sair':
+        return False
+    try:
+        if partes[0] == 'preset':
+            rt.set_gains(PRESET)
+        elif partes[0] == 'zera':
+            rt.set_gains(0.0)
+        elif partes[0] == 'Q':
+            rt.set_q(float(partes[1]))
+        elif partes[0] == 'stats':
+            print(rt.estatisticas())
+        else:
+            # só as bandas abaixo de fs/2 (as outras o Equalizer ignora)
+            distancia = np.where(rt.eq.validas, np.abs(FREQUENCIAS - float(partes[0])), np.inf)
+            banda = int(np.argmin(distancia))
+            ganho = float(np.clip(float(partes[1]), -20, 20))
+            rt.set_gain(banda, ganho)
+            print(f"{FREQUENCIAS[banda]} Hz -> {ganho:+.0f} dB")
+    except (ValueError, IndexError):
+        print('comandos: "<freq> <ganho dB>", "Q <valor>", "preset", "zera", "stats", "sair"')
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='equalizador de 12 bandas em tempo real')
+    parser.add_argument('--bloco', type=int, default=BLOCO, help='amostras por callback')
+    parser.add_argument('--wav', nargs=2, metavar=('ENTRADA', 'SAIDA'),
+                        help='usa WAVs no lugar da placa de som')
+    parser.add_argument('--rapido', action='store_true', help='com --wav, não espera o relógio')
+    parser.add_argument('--preset', action='store_true', help='começa com o preset do final.py')
+    args = parser.parse_args()
+
+    ganhos = PRESET if args.preset else 0.0
+    if args.wav:
+        stream = StreamWav(args.wav[0], args.wav[1], args.bloco, None, not args.rapido)
+        rt = EqualizadorTempoReal(ganhos_db=ganhos, fs=stream.samplerate)
+        stream.callback = rt.callback
+    else:
+        rt = EqualizadorTempoReal(ganhos_db=ganhos)
+        import sounddevice as sd
+        stream = sd.Stream(samplerate=FS, blocksize=args.bloco, channels=1, dtype='float32',
+                           latency='low', callback=rt.callback)
+
+    print('equalizador em tempo real iniciado!')
+    print('comandos: "<freq> <ganho dB>" (ex: "1000 -12"), "Q <valor>", "preset", "zera", "stats", "sair"')
+    with stream:
+        sair = False
+        try:
+            for linha in sys.stdin:
+                if not comando(rt, linha):
+                    sair = True
+                    break
+                if not stream.active:
+                    break
+        except KeyboardInterrupt:
+            sair = True
+        # fim da entrada do terminal: com --wav espera o arquivo acabar
+        while args.wav and not sair and stream.active:
+            time.sleep(0.1)
+    print(rt.estatisticas())
+
+
+if __name__ == "__main__":
+    main()